@@ -0,0 +1,54 @@
+"""
+Activity zones for enemies.
+
+Enemies far from the camera are put to sleep: they are left out of the AI step, movement,
+collisions and animation until the view gets close to them again. An enemy wakes up when
+its rect enters the camera view grown by `wake_margin` and only falls asleep again once it
+leaves the (larger) `sleep_margin` area, so enemies on the border do not flicker between
+both states.
+"""
+
+
+class ActivityScheduler:
+    """Decides every frame which enemies are awake, in a deterministic (group) order."""
+
+    def __init__(self, wake_margin=256, sleep_margin=None):
+        """
+        :param wake_margin: Distance in pixels around the camera view at which enemies wake up.
+        :param sleep_margin: Distance in pixels around the camera view beyond which awake
+            enemies fall asleep. Defaults to `wake_margin` plus 128.
+        """
+        if sleep_margin is None:
+            sleep_margin = wake_margin + 128
+        if sleep_margin < wake_margin:
+            raise ValueError("sleep_margin must not be smaller than wake_margin.")
+        self.wake_margin = wake_margin
+        self.sleep_margin = sleep_margin
+        self._awake = set()
+
+    def __len__(self):
+        return len(self._awake)
+
+    def is_awake(self, entity):
+        return entity in self._awake
+
+    def update(self, view_rect, entities):
+        """
+        Wakes up and puts to sleep the entities around the camera view.
+
+        :param view_rect: Visible area of the level (`Camera.camera_rect`).
+        :param entities: Sequence of sprites with a `rect`.
+        :return: List of the awake entities, in the order of `entities`.
+        """
+        rects = [entity.rect for entity in entities]
+        wake_area = view_rect.inflate(2 * self.wake_margin, 2 * self.wake_margin)
+        sleep_area = view_rect.inflate(2 * self.sleep_margin, 2 * self.sleep_margin)
+        in_wake_area = set(wake_area.collidelistall(rects))
+
+        awake = []
+        for index in sleep_area.collidelistall(rects):
+            entity = entities[index]
+            if index in in_wake_area or entity in self._awake:
+                awake.append(entity)
+        self._awake = set(awake)
+        return awake
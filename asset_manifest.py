@@ -0,0 +1,207 @@
+"""
+Asset manifest.
+
+Records which assets every scene loads (the levels of levels_config.json, with the enemy
+types each one spawns, and the menus) next to an inventory of the files under sprites/,
+sounds/, fonts/ and music/, and flags the files no scene uses. `ResourceManager.warm_up`
+and the level preloader read it to load everything a scene needs before it starts.
+
+Each scene is built in a fresh headless process while `ResourceManager.recording` collects
+the requested assets, so the list matches what the game actually loads. Characters are
+recorded with their sprite sheets; `scene_assets` swaps those for the packed atlas (see
+sprite_atlas.py) where it is up to date:
+
+    python asset_manifest.py                 # rebuild asset_manifest.json, report unused files
+    python asset_manifest.py --warm-up fase1 # load a scene's assets, report time and size of each
+
+Rebuild the manifest after adding assets, enemy types or levels.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+
+MANIFEST_FILE = "asset_manifest.json"
+ASSET_DIRECTORIES = {
+    "sprites": (".png", ".jpg", ".txt"),
+    "sounds": (".mp3", ".ogg", ".wav"),
+    "fonts": (".ttf", ".otf"),
+    "music": (".mp3", ".ogg", ".wav"),
+}
+MENU_SCENES = ("menu", "pause", "settings", "lose", "win", "instructions")
+RECORD_PREFIX = "ASSETS "  # Marks the line of a recording process that holds its result
+GENERATED_DIRECTORIES = (os.path.join("sprites", "atlas"),)  # Built from other assets, not inventoried
+
+_manifests = {}
+
+
+def scan_files():
+    """Returns {path: size in bytes} of the asset files, with forward slashes"""
+    files = {}
+    for directory, extensions in ASSET_DIRECTORIES.items():
+        for root, _, names in os.walk(directory):
+            if root.startswith(GENERATED_DIRECTORIES):
+                continue
+            for name in names:
+                if name.lower().endswith(extensions):
+                    path = os.path.join(root, name)
+                    files[path.replace(os.sep, "/")] = os.path.getsize(path)
+    return dict(sorted(files.items()))
+
+
+def level_names(config_file="levels_config.json"):
+    """Levels of the configuration whose LDtk project exists"""
+    with open(config_file) as f:
+        configs = json.load(f)
+    names = []
+    for name, config in configs.items():
+        if os.path.exists(config.get("level_file", "")):
+            names.append(name)
+        else:
+            logging.warning(f"Skipping {name}: missing level file {config.get('level_file')}")
+    return names
+
+
+def record_scene(scene_name):
+    """
+    Builds and enters a scene in this process and returns the assets it requested. Meant
+    for a fresh process: what earlier scenes cached is not requested again.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ["SPRITE_ATLAS"] = "0"  # Record the sprite sheets themselves, see `scene_assets`
+    from director import Director
+    from resource_manager import ResourceManager
+
+    director = Director(background_loading=False)
+    with ResourceManager.recording() as requested:
+        try:
+            scene = director.scene_factory.create(scene_name)
+            scene.on_enter()
+        except (Exception, SystemExit) as err:
+            # What was requested before the error is still recorded
+            logging.warning(f"Error building {scene_name}: {err}")
+    return requested
+
+
+def _record_in_subprocess(scene_name):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--record", scene_name],
+                            capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith(RECORD_PREFIX):
+            return json.loads(line[len(RECORD_PREFIX):])
+    raise RuntimeError(f"Recording {scene_name} failed:\n{result.stderr}")
+
+
+def build_manifest(scenes=None):
+    """
+    :param scenes: Scene names to record; by default every playable level and every menu.
+    :return: The manifest: "files" (inventory), "scenes" (assets per scene), "unused" (files
+             no scene loads) and "missing" (files scenes load that do not exist).
+    """
+    files = scan_files()
+    recorded = {name: _record_in_subprocess(name) for name in scenes or level_names() + list(MENU_SCENES)}
+    used = set()
+    for assets in recorded.values():
+        for asset in assets:
+            path = _asset_file(asset)
+            if path is not None:
+                used.add(path)
+    return {
+        "files": files,
+        "scenes": recorded,
+        "unused": [path for path in files if path not in used],
+        "missing": sorted(path for path in used if not os.path.exists(path)),
+    }
+
+
+def write_manifest(manifest, path=MANIFEST_FILE):
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+    _manifests.pop(path, None)
+
+
+def load_manifest(path=MANIFEST_FILE):
+    """Returns the manifest stored at `path`, or an empty one if there is none"""
+    if path not in _manifests:
+        try:
+            with open(path, encoding="utf-8") as f:
+                _manifests[path] = json.load(f)
+        except (OSError, ValueError) as err:
+            logging.warning(f"No asset manifest at {path} ({err}); run asset_manifest.py to build it")
+            _manifests[path] = {}
+    return _manifests[path]
+
+
+def _asset_file(asset):
+    """The file of an asset as the manifest lists it, or None"""
+    from resource_manager import ResourceManager
+    path = ResourceManager.asset_path(asset)
+    return os.path.normpath(path).replace(os.sep, "/") if path is not None else None
+
+
+def _as_tuple(value):
+    return tuple(_as_tuple(item) for item in value) if isinstance(value, list) else value
+
+
+def scene_assets(scene_name, manifest):
+    """
+    The assets of a scene as `ResourceManager.load_asset` tuples, without those whose file
+    was missing when the manifest was built: loading them could only fail.
+    """
+    from characters import AVAILABLE_ACTIONS
+    from sprite_atlas import packed_assets
+    missing = set(manifest.get("missing", []))
+    assets = []
+    for asset in manifest.get("scenes", {}).get(scene_name, []):
+        asset = _as_tuple(asset)
+        if missing and _asset_file(asset) in missing:
+            continue
+        for loaded in packed_assets(asset, AVAILABLE_ACTIONS):
+            if loaded not in assets:
+                assets.append(loaded)
+    return assets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the asset manifest or warm up a scene from it.")
+    parser.add_argument("scenes", nargs="*", help="Scenes to record (default: all playable levels and menus)")
+    parser.add_argument("--warm-up", metavar="SCENE", help="Load the assets of a scene and report each one")
+    parser.add_argument("--record", metavar="SCENE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.record:
+        print(RECORD_PREFIX + json.dumps(record_scene(args.record), ensure_ascii=False))
+        return
+
+    if args.warm_up:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        import pygame
+        from resource_manager import ResourceManager
+        pygame.init()
+        pygame.display.set_mode((1, 1))
+        report = ResourceManager.warm_up(args.warm_up)
+        for asset, size, elapsed in sorted(report, key=lambda entry: -entry[2]):
+            print(f"{elapsed:8.1f} ms {size / 1024:10.1f} KiB  {' '.join(str(part) for part in asset)}")
+        print(f"{sum(entry[2] for entry in report):8.1f} ms {sum(entry[1] for entry in report) / 1024:10.1f} KiB  "
+              f"total, {len(report)} assets")
+        pygame.quit()
+        return
+
+    manifest = build_manifest(args.scenes)
+    write_manifest(manifest)
+    print(f"{MANIFEST_FILE}: {len(manifest['files'])} files, {len(manifest['scenes'])} scenes")
+    for name, assets in manifest["scenes"].items():
+        print(f"  {name}: {len(assets)} assets")
+    for path in manifest["missing"]:
+        print(f"missing: {path}")
+    for path in manifest["unused"]:
+        print(f"unused: {path}")
+
+if __name__ == "__main__":
+    main()
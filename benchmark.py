@@ -0,0 +1,338 @@
+"""
+Benchmarks of the game's hot paths.
+
+Every benchmark is built from the real LDtk levels and sprite sheets and runs headless
+(SDL dummy drivers). Results are printed as a table and can be written to JSON and
+compared against a stored baseline:
+
+    python benchmark.py                              # run everything
+    python benchmark.py -k level --rounds 10         # only names containing "level"
+    python benchmark.py --save-baseline bench.json   # store the results as the baseline
+    python benchmark.py --baseline bench.json        # compare; exit status 1 on regressions
+    python benchmark.py --json results.json          # machine-readable results
+
+Times are per call, in microseconds; the median of the rounds is what gets compared.
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+SCREEN_SIZE = (800, 600)
+ENEMY_COUNTS = (10, 50, 200)
+ENEMY_TYPES = ("Rat", "Alien", "Skeleton", "Zombie")
+STEP_TIME = 1000 / 60
+
+BENCHMARKS = []
+
+
+def benchmark(name, **params):
+    """
+    Registers a benchmark. `params` maps parameter names to the values to run it with;
+    the benchmark runs once for every combination.
+
+    The decorated function receives the parameters and returns the callable to time.
+    """
+    def register(setup):
+        keys = list(params)
+        for values in itertools.product(*(params[key] for key in keys)):
+            BENCHMARKS.append((name, dict(zip(keys, values)), setup))
+        return setup
+    return register
+
+
+# -------------------------------------------------
+# Fixtures
+
+_fixtures = {}
+
+
+def fixture(setup):
+    """Caches the result of a fixture function per arguments."""
+    def cached(*args):
+        key = (setup.__name__,) + args
+        if key not in _fixtures:
+            _fixtures[key] = setup(*args)
+        return _fixtures[key]
+    return cached
+
+
+def level_files():
+    return sorted(glob.glob("levels/*.ldtk"))
+
+
+def level_label(level_file):
+    return os.path.splitext(os.path.basename(level_file))[0]
+
+
+@fixture
+def get_screen():
+    pygame.init()
+    return pygame.display.set_mode(SCREEN_SIZE)
+
+
+@fixture
+def get_level(level_file):
+    from level import Level
+    get_screen()
+    return Level(level_file)
+
+
+@fixture
+def get_collision_grid(level_file):
+    from collision_grid import CollisionGrid
+    current = get_level(level_file)
+    return CollisionGrid(current.get_level_collisions(), current.tile_size)
+
+
+def free_positions(level_file, count, seed=0):
+    """(x, bottom) positions in the middle of free collision cells, chosen deterministically."""
+    current = get_level(level_file)
+    size = current.grid_size
+    free = [index for index, solid in enumerate(current.solid_cells) if not solid]
+    rng = random.Random(seed)
+    return [((index % current.grid_columns) * size + size // 2, (index // current.grid_columns + 1) * size - 1)
+            for index in rng.sample(free, count)]
+
+
+def spawn_enemies(level_file, count, seed=0):
+    """A fresh list of enemies of the usual types spread over the free cells of a level."""
+    from fase import EnemyFactory
+    get_screen()
+    return [EnemyFactory.create_enemy(ENEMY_TYPES[index % len(ENEMY_TYPES)], position)
+            for index, position in enumerate(free_positions(level_file, count, seed))]
+
+
+# -------------------------------------------------
+# Benchmarks
+
+@benchmark("level.draw", level=level_files())
+def bench_level_draw(level):
+    from camera import Camera
+    current = get_level(level)
+    surface = get_screen()
+    camera = Camera(current.width, current.height, *SCREEN_SIZE)
+    rng = random.Random(0)
+    views = itertools.cycle([(rng.randrange(current.width), rng.randrange(current.height)) for _ in range(64)])
+
+    def run():
+        camera.camera_rect.center = next(views)
+        current.draw(surface, camera)
+    return run
+
+
+@benchmark("character.update", level=level_files(), enemies=ENEMY_COUNTS)
+def bench_character_update(level, enemies):
+    grid = get_collision_grid(level)
+    group = spawn_enemies(level, enemies)
+    rng = random.Random(0)
+    for enemy in group:
+        angle = rng.uniform(0, 2 * math.pi)
+        enemy.move((math.cos(angle), math.sin(angle)))
+
+    def run():
+        for enemy in group:
+            enemy.update(grid, STEP_TIME)
+    return run
+
+
+@benchmark("character.sprite_frame", enemies=ENEMY_COUNTS)
+def bench_sprite_frame(enemies):
+    group = spawn_enemies(level_files()[0], enemies)
+    # (enemy, walk frames of every direction that has any)
+    walks = [(enemy, [(direction, len(frames)) for direction, frames
+                      in enemy.animation_manager.frame_surfaces['walk'].items() if frames])
+             for enemy in group]
+    ticks = itertools.cycle(range(64))
+
+    def run():
+        tick = next(ticks)
+        for enemy, directions in walks:
+            direction, count = directions[tick % len(directions)]
+            enemy._update_sprite_image(direction, tick % count, 'walk')
+    return run
+
+
+@benchmark("gun.orientation")
+def bench_gun_orientation():
+    from characters import Gun
+    get_screen()
+    gun = Gun(position=(400, 300))
+    targets = itertools.cycle([(400 + 200 * math.cos(math.radians(angle)), 300 + 200 * math.sin(math.radians(angle)))
+                               for angle in range(0, 360, 7)])
+
+    def run():
+        gun.target_position = next(targets)
+        gun.current_frame = (gun.current_frame + 1) % gun.frame_count
+        gun._update_orientation()
+    return run
+
+
+@benchmark("minimap.draw", level=level_files(), enemies=ENEMY_COUNTS)
+def bench_minimap_draw(level, enemies):
+    from minimap import MiniMap
+    current = get_level(level)
+    surface = get_screen()
+    minimap = MiniMap(SCREEN_SIZE[0] - 220, 20, 200, 150, current.width, current.height)
+    details = {'collision_rects': current.get_level_collisions()}
+    positions = free_positions(level, enemies)
+    items = free_positions(level, 8, seed=1)
+
+    def run():
+        # Force the full redraw instead of the throttled re-blit
+        minimap.last_update_time = minimap.last_enemy_update = -10 ** 9
+        minimap.draw(surface, positions[0], positions, items, SCREEN_SIZE, details)
+    return run
+
+
+@benchmark("resource_manager.load_level", level=level_files())
+def bench_load_level(level):
+    from resource_manager import ResourceManager
+    ResourceManager.read_level(level)  # Make sure the compiled cache exists
+
+    def run():
+        ResourceManager.read_level(level)
+    return run
+
+
+@benchmark("level_cache.parse_ldtk", level=level_files())
+def bench_parse_ldtk(level):
+    from level_cache import parse_ldtk
+
+    def run():
+        parse_ldtk(level)
+    return run
+
+
+@benchmark("enemy_ai.step", level=level_files(), enemies=ENEMY_COUNTS)
+def bench_enemy_steering(level, enemies):
+    from enemy_ai import EnemySteering, FlowField
+    current = get_level(level)
+    flow_field = FlowField(current.solid_cells, current.grid_columns, current.grid_rows, current.grid_size)
+    steering = EnemySteering(flow_field=flow_field)
+    group = spawn_enemies(level, enemies)
+
+    class Target:
+        position = (0, 0)
+
+    targets = itertools.cycle(free_positions(level, 32, seed=2))
+
+    def run():
+        Target.position = next(targets)
+        steering.step(group, Target)
+    return run
+
+
+# -------------------------------------------------
+# Runner
+
+def benchmark_id(name, params):
+    if not params:
+        return name
+    labels = [level_label(value) if key == "level" else f"{key}={value}" for key, value in params.items()]
+    return f"{name}[{','.join(labels)}]"
+
+
+def measure(run, rounds, min_round_time):
+    """Times `run`, calibrating the calls per round so a round lasts at least `min_round_time` s."""
+    run()  # Warm up caches
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_round_time / elapsed) + 1))
+
+    samples = [elapsed / number]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        samples.append((time.perf_counter() - start) / number)
+    micro = [sample * 1e6 for sample in samples]
+    return {
+        "min": min(micro),
+        "median": statistics.median(micro),
+        "mean": statistics.fmean(micro),
+        "stdev": statistics.stdev(micro) if len(micro) > 1 else 0.0,
+        "rounds": rounds,
+        "calls_per_round": number,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Prints the change against the baseline and returns the ids that got slower than `threshold`"""
+    regressions = []
+    for bench_id, result in results.items():
+        previous = baseline.get("results", {}).get(bench_id)
+        if previous is None:
+            continue
+        ratio = result["median"] / previous["median"] if previous["median"] else float("inf")
+        status = "SLOWER" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else "same"
+        print(f"  {bench_id:<60} {previous['median']:>12.1f} -> {result['median']:>12.1f} us  x{ratio:.2f}  {status}")
+        if status == "SLOWER":
+            regressions.append(bench_id)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths.")
+    parser.add_argument("-k", dest="filter", default="", help="Only run benchmarks whose id contains this text")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per benchmark")
+    parser.add_argument("--min-round-time", type=float, default=0.05, help="Minimum duration of a round in seconds")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--save-baseline", help="Write the results as a baseline JSON file")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    for name, params, setup in BENCHMARKS:
+        bench_id = benchmark_id(name, params)
+        if args.filter not in bench_id:
+            continue
+        result = measure(setup(**params), args.rounds, args.min_round_time)
+        results[bench_id] = result
+        print(f"{bench_id:<60} median {result['median']:>12.1f} us  min {result['min']:>12.1f} us  "
+              f"(x{result['calls_per_round']} calls, {result['rounds']} rounds)")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "machine": platform.platform(),
+        "results": results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline}:")
+        regressions = compare(results, baseline, args.threshold)
+
+    pygame.quit()
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
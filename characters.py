@@ -14,6 +14,8 @@ from enum import IntEnum
 from collections import namedtuple
 from pygame.locals import *
 from resource_manager import ResourceManager
+from sim_clock import sim_clock
+from sprite_atlas import ATLAS_DIRECTORY, INDEX_FILE, packed_frames
 from abc import ABC, abstractmethod
 
 # -------------------------------------------------
@@ -75,6 +77,10 @@ class DamageConstants:
     FATTY = 3
     NHEMBITRON = 5
 
+class RotationConstants:
+    """Container for sprite rotation constants."""
+    STEP = 5  # Angular resolution of the pre-rotated gun and bullet sprites, in degrees
+
 class DirectionMapping:
     """Maps logical directions to sprite sheet directions."""
     SPRITE_DIRECTION = {
@@ -148,59 +154,169 @@ class SpriteSheet:
         self.coordinates_text = coordinates_text
 
 
-class AnimationManager:
-    """Manages character animations and sprite frames."""
+class AnimationAtlas:
+    """Immutable animation data of a sprite prefix, shared by every character using it.
     
-    def __init__(self, image_prefix):
+    Holds the sprite sheets, the frame rects and the pre-rendered frame surfaces, all indexed
+    [action][direction][frame]. Atlases are built once per prefix through AnimationAtlas.get(),
+    from the packed sprite atlas page of the prefix when there is an up-to-date one (see
+    sprite_atlas.py) and otherwise from its sprite sheets and coordinates files, and cached
+    by the ResourceManager as ("atlas", prefix) derived assets.
+    """
+    
+    @staticmethod
+    def asset(image_prefix):
+        """The derived asset of a prefix's atlas, e.g. to pin it while its characters are in use."""
+        return ("atlas", image_prefix)
+    
+    @classmethod
+    def get(cls, image_prefix):
+        """Return the shared atlas for a sprite prefix, building it on first use."""
+        return ResourceManager.load_derived(cls.asset(image_prefix), lambda: cls(image_prefix))
+    
+    @classmethod
+    def is_built(cls, image_prefix):
+        return ResourceManager.is_cached(cls.asset(image_prefix))
+    
+    @classmethod
+    def build_steps(cls, image_prefix):
+        """Build the shared atlas of a prefix, yielding after every direction it pre-renders.
+        
+        The atlas is only shared by get() once it is complete. Returns it, or None if it
+        was already built.
+        """
+        if cls.is_built(image_prefix):
+            return None
+        atlas = cls(image_prefix, render=False)
+        yield
+        yield from atlas.render_steps()
+        if cls.is_built(image_prefix):
+            return None
+        return ResourceManager.add_derived(cls.asset(image_prefix), atlas)
+    
+    def __init__(self, image_prefix, render=True):
+        """
+        :param image_prefix: Sprite prefix of the character.
+        :param render: Whether to pre-render the frames right away. Otherwise `render_steps`
+            has to be run before the atlas is used.
+        """
+        self.image_prefix = image_prefix
         self.sprite_sheets = {}
-        self.frame_rects = {}
-        self.current_action = 'walk'
+        frame_rects = {}
         
         # Initialize frame rect dictionaries
         for action in AVAILABLE_ACTIONS:
-            self.frame_rects[action.prefix] = {}
+            frame_rects[action.prefix] = {}
             for direction in Direction:
-                self.frame_rects[action.prefix][direction] = []
+                frame_rects[action.prefix][direction] = []
                 
-        self._load_actions(image_prefix)
+        self._load_actions(image_prefix, frame_rects)
+        
+        # Freeze the frame lists so instances can only read them
+        self.frame_rects = {
+            action: {direction: tuple(rects) for direction, rects in directions.items()}
+            for action, directions in frame_rects.items()
+        }
+        self.max_frame_dimensions = self._compute_max_frame_dimensions()
+        self.frame_surfaces = {}
+        if render:
+            for _ in self.render_steps():
+                pass
     
-    def _load_actions(self, image_prefix):
-        """Load sprite sheets and coordinate data for all actions."""
+    def render_steps(self):
+        """Pre-render every frame bottom-centred on a surface of the maximum frame size.
+        
+        Fills frame_surfaces, indexed like frame_rects: [action][direction][frame], yielding
+        after every direction so the work can be spread over frames. Frames whose rect falls
+        outside their sprite sheet are stored as None.
+        """
+        size = self.max_frame_dimensions
         for action in AVAILABLE_ACTIONS:
+            sprite_sheet = self.sprite_sheets.get(action.prefix)
+            directions = self.frame_surfaces.setdefault(action.prefix, {})
+            for direction in Direction:
+                directions[direction] = tuple(
+                    self._render_frame(sprite_sheet.image, frame_rect, size) if sprite_sheet else None
+                    for frame_rect in self.frame_rects[action.prefix][direction]
+                )
+                yield
+    
+    @staticmethod
+    def _render_frame(sprite_sheet, sprite_rect, size):
+        """Render one sprite sheet frame bottom-centred on a transparent surface of the given size."""
+        if sprite_rect.right > sprite_sheet.get_width() or sprite_rect.bottom > sprite_sheet.get_height():
+            return None
+        frame_surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+        frame_surface.fill((0, 0, 0, 0))
+        original_image = sprite_sheet.subsurface(sprite_rect)
+        img_rect = original_image.get_rect(midbottom=(size[0] // 2, size[1]))
+        frame_surface.blit(original_image, img_rect)
+        return frame_surface
+    
+    @staticmethod
+    def sheet_files(image_prefix):
+        """(sprite sheet, coordinates file) of every action, relative to the sprites folder."""
+        return [(f"{image_prefix}/{action.prefix}.png", f"{image_prefix}/{action.prefix}.txt")
+                for action in AVAILABLE_ACTIONS]
+    
+    @classmethod
+    def assets(cls, image_prefix):
+        """What building the atlas of a prefix loads, as ResourceManager.load_asset tuples."""
+        packed = packed_frames(image_prefix, AVAILABLE_ACTIONS)
+        if packed is not None:
+            return [("sprite_index", INDEX_FILE), ("image", packed[0], ATLAS_DIRECTORY)]
+        return [asset for sprite_sheet, coordinates in cls.sheet_files(image_prefix)
+                for asset in (("image", sprite_sheet, "sprites"), ("coordinates", coordinates))]
+    
+    def _load_actions(self, image_prefix, frame_rects):
+        """Load sprite sheets and coordinate data for all actions."""
+        packed = packed_frames(image_prefix, AVAILABLE_ACTIONS)
+        if packed is not None:
+            # Every action reads its frames from the same atlas page
+            page, packed_rects = packed
+            page_image = ResourceManager.load_image(page, ATLAS_DIRECTORY)
+            for action in AVAILABLE_ACTIONS:
+                self.sprite_sheets[action.prefix] = SpriteSheet(page_image, None)
+                frame_rects[action.prefix].update(packed_rects[action.prefix])
+            return
+        
+        # No up-to-date packed atlas (sprite_atlas.ensure_atlas builds it when the game starts):
+        # one sprite sheet and coordinates file per action
+        for action, (sprite_sheet_path, coords_path) in zip(AVAILABLE_ACTIONS, self.sheet_files(image_prefix)):
             try:
-                sprite_sheet_path = f"{image_prefix}/{action.prefix}.png"
                 sprite_sheet = ResourceManager.load_image(sprite_sheet_path)
-                coords_path = f"{image_prefix}/{action.prefix}.txt"
                 coords_text = ResourceManager.load_coordinates(coords_path)
                 self.sprite_sheets[action.prefix] = SpriteSheet(sprite_sheet, coords_text)
-                self._process_coordinates(action, coords_text)
+                frame_rects[action.prefix].update(self.parse_coordinates(action, coords_text))
                 if DEBUG_SPRITES:
                     self._visualize_sprite_sheet(
                         sprite_sheet, 
-                        self.frame_rects,
+                        frame_rects,
                         f"Sprite Debug - {image_prefix}/{action.prefix}"
                     )
             except Exception as e:
                 print(f"Error loading sprites for {image_prefix}/{action.prefix}: {e}")
     
-    def _process_coordinates(self, action, coords_text):
-        """Process sprite sheet coordinate data into usable rectangles."""
+    @staticmethod
+    def parse_coordinates(action, coords_text):
+        """Frame rectangles of an action, {direction: [rect, ...]}, from its sprite sheet coordinate data."""
         data = coords_text.split()
+        frame_rects = {direction: [] for direction in Direction}
         for direction in range(len(action.numImages)):
-            self.frame_rects[action.prefix][direction] = []
             for frame in range(action.numImages[direction]):
                 index = sum(action.numImages[prev_dir] * 4 for prev_dir in range(direction)) + frame * 4
                 if index + 3 < len(data):
                     rect = pygame.Rect(
                         (int(data[index]), int(data[index+1])),
                         (int(data[index+2]), int(data[index+3])))
-                    self.frame_rects[action.prefix][direction].append(rect)
+                    frame_rects[direction].append(rect)
         
         # Handle idle direction if it doesn't have dedicated frames
-        if not self.frame_rects[action.prefix][Direction.IDLE] and self.frame_rects[action.prefix][Direction.DOWN]:
-            self.frame_rects[action.prefix][Direction.IDLE] = [self.frame_rects[action.prefix][Direction.DOWN][0]]
+        if not frame_rects[Direction.IDLE] and frame_rects[Direction.DOWN]:
+            frame_rects[Direction.IDLE] = [frame_rects[Direction.DOWN][0]]
+        return frame_rects
     
-    def get_max_frame_dimensions(self):
+    def _compute_max_frame_dimensions(self):
         """Calculate maximum dimensions across all frames."""
         max_width = 0
         max_height = 0
@@ -217,6 +333,32 @@ class AnimationManager:
         pass
 
 
+class AnimationManager:
+    """Manages a character's animation state on top of its shared AnimationAtlas."""
+    
+    __slots__ = ('atlas', 'current_action')
+    
+    def __init__(self, image_prefix):
+        self.atlas = AnimationAtlas.get(image_prefix)
+        self.current_action = 'walk'
+    
+    @property
+    def sprite_sheets(self):
+        return self.atlas.sprite_sheets
+    
+    @property
+    def frame_rects(self):
+        return self.atlas.frame_rects
+    
+    @property
+    def frame_surfaces(self):
+        return self.atlas.frame_surfaces
+    
+    def get_max_frame_dimensions(self):
+        """Return maximum dimensions across all frames."""
+        return self.atlas.max_frame_dimensions
+
+
 class Damageable(ABC):
     """Interface for any entity that can take damage."""
     
@@ -290,7 +432,7 @@ class Character(MySprite, Damageable):
             self.is_hurt = True
             self.animation_manager.current_action = 'hurt'
             self.hurt_frame_index = 0
-            self.last_hurt_update = pygame.time.get_ticks()
+            self.last_hurt_update = sim_clock.get_ticks()
             self.attack_in_progress = False
 
     def move(self, movement):
@@ -332,7 +474,7 @@ class Character(MySprite, Damageable):
             self.animation_manager.current_action = 'slash'
             self.attack_sound.play()
             self.attack_frame_index = 0
-            self.last_attack_update = pygame.time.get_ticks()
+            self.last_attack_update = sim_clock.get_ticks()
 
     def update_posture(self):
         """Update character's visual appearance based on state."""
@@ -345,7 +487,7 @@ class Character(MySprite, Damageable):
 
     def _update_hurt_animation(self):
         """Update hurt animation frames."""
-        now = pygame.time.get_ticks()
+        now = sim_clock.get_ticks()
         if now - self.last_hurt_update > AnimationConstants.HURT_DELAY:
             self.last_hurt_update = now
             self.hurt_frame_index += 1
@@ -366,7 +508,7 @@ class Character(MySprite, Damageable):
 
     def _update_attack_animation(self):
         """Update attack animation frames."""
-        now = pygame.time.get_ticks()
+        now = sim_clock.get_ticks()
         if now - self.last_attack_update > AnimationConstants.ATTACK_DELAY:
             self.last_attack_update = now
             self.attack_frame_index += 1
@@ -415,51 +557,14 @@ class Character(MySprite, Damageable):
 
     def _update_sprite_image(self, sprite_direction, frame_index, action):
         """Update the character's visual sprite based on animation frame."""
-        frames = self.animation_manager.frame_rects[action]
+        frames = self.animation_manager.frame_surfaces[action]
         if sprite_direction < len(frames) and frames[sprite_direction]:
             max_frames = len(frames[sprite_direction])
-            frame_index = frame_index % max_frames
-            try:
-                sprite_rect = frames[sprite_direction][frame_index]
-                sprite_sheet = self.animation_manager.sprite_sheets[self.animation_manager.current_action].image
-                
-                if self._is_sprite_rect_valid(sprite_rect, sprite_sheet):
-                    self._render_sprite_frame(sprite_sheet, sprite_rect)
-                    
-            except ValueError as e:
-                self._handle_sprite_error(f"Error updating sprite: {e}", sprite_direction, action)
-
-    def _is_sprite_rect_valid(self, sprite_rect, sprite_sheet):
-        """Check if sprite rect is within the bounds of the sprite sheet."""
-        return (sprite_rect.right <= sprite_sheet.get_width() and 
-                sprite_rect.bottom <= sprite_sheet.get_height())
-
-    def _render_sprite_frame(self, sprite_sheet, sprite_rect):
-        """Render the current sprite frame onto the sprite's image surface."""
-        old_midbottom = self.rect.midbottom  # Save position
-        
-        # Create transparent surface of max size
-        self.image = pygame.Surface(self.rect.size, pygame.SRCALPHA)
-        self.image.fill((0, 0, 0, 0))
-        
-        # Get current frame and center at bottom
-        original_image = sprite_sheet.subsurface(sprite_rect)
-        img_rect = original_image.get_rect(
-            midbottom=(self.rect.width//2, self.rect.height)
-        )
-        
-        self.image.blit(original_image, img_rect)
-        self.rect.midbottom = old_midbottom  # Restore position
-        self.set_screen_position(self.scroll)
-
-    def _handle_sprite_error(self, error_message, sprite_direction, action):
-        """Handle errors when updating sprites."""
-        print(error_message)
-        self.frame_indices[self.facing_direction] = 0
-        frames = self.animation_manager.frame_rects[action][sprite_direction]
-        if frames:
-            first_rect = frames[0]
-            self.image = self.animation_manager.sprite_sheets[self.animation_manager.current_action].image.subsurface(first_rect)
+            frame_surface = frames[sprite_direction][frame_index % max_frames]
+            if frame_surface is not None:
+                # Frames are pre-rendered at the character's size, so this is a plain swap
+                self.image = frame_surface
+                self.set_screen_position(self.scroll)
 
     def _normalize_movement_vector(self):
         """Normalize the movement vector for consistent speed in all directions."""
@@ -476,14 +581,14 @@ class Character(MySprite, Damageable):
             
         if axis == 'x':
             if speed > 0:
-                self.rect.right = min(c.rect.left for c in collision_list)
+                self.rect.right = min(c.left for c in collision_list)
             else:
-                self.rect.left = max(c.rect.right for c in collision_list)
+                self.rect.left = max(c.right for c in collision_list)
         else:  # axis == 'y'
             if speed > 0:
-                self.rect.bottom = min(c.rect.top for c in collision_list)
+                self.rect.bottom = min(c.top for c in collision_list)
             else:
-                self.rect.top = max(c.rect.bottom for c in collision_list)
+                self.rect.top = max(c.bottom for c in collision_list)
 
     def update(self, collisionTiles, time):
         """Update character position, handle collisions, and animate."""
@@ -500,12 +605,12 @@ class Character(MySprite, Damageable):
         
         # Move in X direction and handle collisions
         self.rect.x += speed_x * time
-        collision_list = pygame.sprite.spritecollide(self, collisionTiles, False)
+        collision_list = collisionTiles.query(self.rect)
         self._handle_collision('x', speed_x, collision_list, time)
         
         # Move in Y direction and handle collisions
         self.rect.y += speed_y * time
-        collision_list = pygame.sprite.spritecollide(self, collisionTiles, False)
+        collision_list = collisionTiles.query(self.rect)
         self._handle_collision('y', speed_y, collision_list, time)
         
         # Update stored position
@@ -517,9 +622,10 @@ class Character(MySprite, Damageable):
 
 class Player(Character):
     """Player character class."""
-    
+    IMAGE_PREFIX = 'thiagic'
+
     def __init__(self):
-        super().__init__('thiagic', MovementConstants.PLAYER, AnimationConstants.PLAYER_DELAY, health=HealthConstants.PLAYER, damage=DamageConstants.PLAYER)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.PLAYER, AnimationConstants.PLAYER_DELAY, health=HealthConstants.PLAYER, damage=DamageConstants.PLAYER)
         self.attack_key_pressed_last_frame = False
         self.attack_sound = ResourceManager.load_sound("slash.mp3")
         self.max_health = self.health
@@ -580,20 +686,20 @@ class Player(Character):
             self.is_hurt = True
             self.animation_manager.current_action = 'hurt'
             self.hurt_frame_index = 0
-            self.last_hurt_update = pygame.time.get_ticks()
+            self.last_hurt_update = sim_clock.get_ticks()
             self.attack_in_progress = False
 
     def activate_invincibility(self):
         """Activate invincibility for the player."""
         if not self.invincible_used:
             self.invincible = True
-            self.invincible_start_time = pygame.time.get_ticks()
+            self.invincible_start_time = sim_clock.get_ticks()
             self.invincible_used = True
 
     def update_invincibility(self):
         """Update invincibility status based on duration."""
         if self.invincible:
-            current_time = pygame.time.get_ticks()
+            current_time = sim_clock.get_ticks()
             if current_time - self.invincible_start_time > self.invincible_duration:
                 self.invincible = False
 
@@ -631,130 +737,131 @@ class Enemy(Character):
 # Enemy types - each with specific stats
 class Rat(Enemy):
     """Rat enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_rat'
+
     def __init__(self):
-        super().__init__('enemies/enemy_rat', MovementConstants.RAT, AnimationConstants.PLAYER_DELAY, HealthConstants.RAT, DamageConstants.RAT)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.RAT, AnimationConstants.PLAYER_DELAY, HealthConstants.RAT, DamageConstants.RAT)
 
 class Alien(Enemy):
     """Alien enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_alien'
+
     def __init__(self):
-        super().__init__('enemies/enemy_alien', MovementConstants.ALIEN, AnimationConstants.PLAYER_DELAY, HealthConstants.ALIEN, DamageConstants.ALIEN)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.ALIEN, AnimationConstants.PLAYER_DELAY, HealthConstants.ALIEN, DamageConstants.ALIEN)
         
 class Minotaur(Enemy):
     """Minotaur enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_minotaur'
+
     def __init__(self):
-        super().__init__('enemies/enemy_minotaur', MovementConstants.MINOTAUR, AnimationConstants.PLAYER_DELAY, HealthConstants.MINOTAUR, DamageConstants.MINOTAUR)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.MINOTAUR, AnimationConstants.PLAYER_DELAY, HealthConstants.MINOTAUR, DamageConstants.MINOTAUR)
         self.death_sound = ResourceManager.load_sound("minotaur.mp3")
 
 class Skeleton(Enemy):
     """Skeleton enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_skeleton'
+
     def __init__(self):
-        super().__init__('enemies/enemy_skeleton', MovementConstants.SKELETON, AnimationConstants.PLAYER_DELAY, HealthConstants.SKELETON, DamageConstants.SKELETON)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.SKELETON, AnimationConstants.PLAYER_DELAY, HealthConstants.SKELETON, DamageConstants.SKELETON)
 
 class Zombie(Enemy):
     """Zombie enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_zombi'
+
     def __init__(self):
-        super().__init__('enemies/enemy_zombi', MovementConstants.ZOMBIE, AnimationConstants.PLAYER_DELAY, HealthConstants.ZOMBIE, DamageConstants.ZOMBIE)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.ZOMBIE, AnimationConstants.PLAYER_DELAY, HealthConstants.ZOMBIE, DamageConstants.ZOMBIE)
 
 class Reptilian(Enemy):
     """Reptilian enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_reptiliano'
+
     def __init__(self):
-        super().__init__('enemies/enemy_reptiliano', MovementConstants.REPTILIAN, AnimationConstants.PLAYER_DELAY, HealthConstants.REPTILIAN, DamageConstants.REPTILIAN)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.REPTILIAN, AnimationConstants.PLAYER_DELAY, HealthConstants.REPTILIAN, DamageConstants.REPTILIAN)
 
 class Frank(Enemy):
     """Frank enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_frank_head'
+
     def __init__(self):
-        super().__init__('enemies/enemy_frank_head', MovementConstants.FRANK, AnimationConstants.PLAYER_DELAY, HealthConstants.FRANK, DamageConstants.FRANK)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.FRANK, AnimationConstants.PLAYER_DELAY, HealthConstants.FRANK, DamageConstants.FRANK)
 
 class Fatty(Enemy):
     """Fatty enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_gordibola'
+
     def __init__(self):
-        super().__init__('enemies/enemy_gordibola', MovementConstants.FATTY, AnimationConstants.PLAYER_DELAY, HealthConstants.FATTY, DamageConstants.FATTY)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.FATTY, AnimationConstants.PLAYER_DELAY, HealthConstants.FATTY, DamageConstants.FATTY)
 
 class Nhembitron(Enemy):
     """Nhembitron enemy class."""
+    IMAGE_PREFIX = 'enemies/enemy_nhembitron'
+
     def __init__(self):
-        super().__init__('enemies/enemy_nhembitron', MovementConstants.NHEMBITRON, AnimationConstants.PLAYER_DELAY, HealthConstants.NHEMBITRON, DamageConstants.NHEMBITRON)
+        super().__init__(self.IMAGE_PREFIX, MovementConstants.NHEMBITRON, AnimationConstants.PLAYER_DELAY, HealthConstants.NHEMBITRON, DamageConstants.NHEMBITRON)
 
 
 # -------------------------------------------------
-# Gun and Bullet Classes
+# Gun and Turret Classes
 # -------------------------------------------------
 
-class Bullet(MySprite):
-    """Bullet class for projectiles fired from guns."""
+class RotationCache:
+    """Rotated variants of a list of frames, looked up by quantised angle.
     
-    def __init__(self, position, target_position, speed=5, damage=1):
-        super().__init__()
-        self.position = position
-        self.original_position = position
-        self.target_position = target_position
-        self.damage = damage
-        self.max_distance = 500  # Maximum travel distance
-        
-        # Load bullet sprite
-        self.original_image = ResourceManager.load_image("bullet.png")
-        
-        # Initialize bullet direction and appearance
-        self._setup_bullet_trajectory(position, target_position, speed)
-        
-    def _setup_bullet_trajectory(self, position, target_position, speed):
-        """Calculate bullet trajectory and orientation."""
-        dx = target_position[0] - position[0]
-        dy = target_position[1] - position[1]
-        distance = (dx**2 + dy**2)**0.5
-        
-        if distance > 0:
-            self.speed = (dx/distance * speed, dy/distance * speed)
-            # Calculate angle and rotate image
-            angle = math.degrees(math.atan2(-dy, dx))
-            self.image = pygame.transform.rotate(self.original_image, angle)
-        else:
-            self.speed = (0, 0)
-            self.image = self.original_image
-        
-        # Set up initial position
-        self.rect = self.image.get_rect(center=position)
-        
-    def update(self, collisionTiles=None, time=None):
-        """Update bullet position and check for collisions or max distance."""
-        # Handle different parameter patterns
-        if collisionTiles is not None and not isinstance(collisionTiles, pygame.sprite.Group):
-            time = collisionTiles
-            collisionTiles = None
-            
-        # Default time value if none provided
-        if time is None:
-            time = 1
-        
-        # Let parent class update position
-        super().update(time)
-        
-        # Update rect position
-        self.rect.center = self.position
-        
-        # Check if bullet has traveled maximum distance
-        if self._has_traveled_max_distance():
-            self.kill()
-            return
-            
-        # Check collision with tiles if provided
-        if collisionTiles and self._check_collision(collisionTiles):
-            self.kill()
-            
-    def _has_traveled_max_distance(self):
-        """Check if bullet has exceeded its maximum travel distance."""
-        current_distance = ((self.position[0] - self.original_position[0])**2 + 
-                           (self.position[1] - self.original_position[1])**2)**0.5
-        return current_distance > self.max_distance
-        
-    def _check_collision(self, collisionTiles):
-        """Check if bullet collides with any tiles."""
-        return pygame.sprite.spritecollide(self, collisionTiles, False)
+    Angles are snapped to multiples of `step` degrees and each (frame, angle) variant is
+    rendered the first time it is requested, so no frame is ever rotated twice. With
+    `flip_backwards`, frames pointing backwards (beyond +-90 degrees) are flipped
+    vertically before rotating so they stay upright.
+    """
+    
+    def __init__(self, frames, step=RotationConstants.STEP, flip_backwards=False):
+        self.frames = frames
+        self.step = step
+        self.steps = int(round(360 / step))
+        self.flip_backwards = flip_backwards
+        self._table = {}
+    
+    def quantise(self, angle):
+        """Return the index of the angle step closest to `angle` (degrees)."""
+        return int(round(angle / self.step)) % self.steps
+    
+    def get(self, frame_index, angle):
+        """Return frame `frame_index` rotated by `angle` degrees, snapped to the cache resolution."""
+        key = (frame_index, self.quantise(angle))
+        image = self._table.get(key)
+        if image is None:
+            image = self._render(*key)
+            self._table[key] = image
+        return image
+    
+    def prerender(self):
+        """Render every frame at every angle step up front."""
+        for frame_index in range(len(self.frames)):
+            for angle_index in range(self.steps):
+                self.get(frame_index, angle_index * self.step)
+        return self
+    
+    def rendered(self):
+        """The rotated variants rendered so far."""
+        return self._table.values()
+    
+    def _render(self, frame_index, angle_index):
+        """Render one rotated variant."""
+        angle = angle_index * self.step
+        if angle > 180:
+            angle -= 360
+        frame = self.frames[frame_index]
+        if self.flip_backwards and (angle > 90 or angle < -90):
+            frame = pygame.transform.flip(frame, False, True)
+        return pygame.transform.rotate(frame, angle)
 
 
 class Gun(MySprite):
     """Gun class that fires bullets at the player."""
     
+    # Gun frames and their rotated variants, shared by every gun through the ResourceManager
+    ROTATIONS = ("rotations", "AK47.png")
+    FRAME_COUNT = 20  # 1 column, 20 rows
+    
     def __init__(self, position=(0, 0), fire_rate=2000, bullet_speed=3, damage=1):
         super().__init__()
         self.position = position
@@ -763,6 +870,7 @@ class Gun(MySprite):
         self.damage = damage
         self.last_shot_time = 0
         self.target_position = position  # Initial target position
+        self.projectiles = None  # ProjectileSystem the bullets are fired into
         
         self._load_sprites()
         self._setup_animation()
@@ -770,43 +878,49 @@ class Gun(MySprite):
         
     def _load_sprites(self):
         """Load gun sprites from spritesheet."""
-        self.original_image = pygame.transform.flip(ResourceManager.load_image("AK47.png"), True, False)
-        self.frame_count = 20  # 1 column, 20 rows
-        self.frame_height = self.original_image.get_height() // self.frame_count
-        self.frame_width = self.original_image.get_width()
+        self.frame_count = self.FRAME_COUNT
+        self.rotations = ResourceManager.load_derived(self.ROTATIONS, self._build_rotations)
+        self.frames = self.rotations.frames
+        self.frame_width = self.frames[0].get_width()
+        self.frame_height = self.frames[0].get_height()
+    
+    @classmethod
+    def _build_rotations(cls):
+        """Cut the gun frames out of their spritesheet and render all their rotations."""
+        original_image = pygame.transform.flip(ResourceManager.load_image(cls.ROTATIONS[1]), True, False)
+        frame_height = original_image.get_height() // cls.FRAME_COUNT
+        frame_width = original_image.get_width()
         
         # Extract frames from spritesheet
-        self.frames = []
-        for i in range(self.frame_count):
-            frame_rect = pygame.Rect(0, i * self.frame_height, self.frame_width, self.frame_height)
-            frame_image = self.original_image.subsurface(frame_rect)
-            self.frames.append(frame_image)
+        frames = []
+        for i in range(cls.FRAME_COUNT):
+            frame_rect = pygame.Rect(0, i * frame_height, frame_width, frame_height)
+            frames.append(original_image.subsurface(frame_rect))
+        # Tints of a previous table are keyed by its images and would never be used again
+        ResourceManager.clear("tint")
+        # Turrets are built with their level, so no rotation is left for the game loop
+        return RotationCache(frames, flip_backwards=True).prerender()
             
     def _setup_animation(self):
         """Set up animation-related variables."""
         self.current_frame = 0
         self.animation_delay = 100  # Time per frame in ms
-        self.last_frame_update = pygame.time.get_ticks()
+        self.last_frame_update = sim_clock.get_ticks()
         self.image = self.frames[self.current_frame]
         self.rect = self.image.get_rect(center=self.position)
-        self.bullets = pygame.sprite.Group()
         
     def _load_sounds(self):
         """Load gun-related sound effects."""
         self.fire_sound = ResourceManager.load_sound("fire_sound.mp3")
 
     def update(self, collisionTiles=None, player=None, time=None):
-        """Update gun state, animations, and bullets."""
+        """Update gun state and animations. Bullets are stepped by their ProjectileSystem."""
         # Handle default time parameter
         if time is None:
             time = 1
             
         super().update(time)
         
-        # Update bullets
-        for bullet in self.bullets:
-            bullet.update(collisionTiles, time)
-        
         # Fire at player if in range
         self._handle_firing(player)
         
@@ -819,7 +933,7 @@ class Gun(MySprite):
     def _handle_firing(self, player):
         """Handle firing logic when player is in range."""
         if player:
-            current_time = pygame.time.get_ticks()
+            current_time = sim_clock.get_ticks()
             self.target_position = player.position
             if current_time - self.last_shot_time > self.fire_rate:
                 self.fire_at(player.position)
@@ -827,7 +941,7 @@ class Gun(MySprite):
                 
     def _update_animation(self):
         """Update gun animation frames."""
-        current_time = pygame.time.get_ticks()
+        current_time = sim_clock.get_ticks()
         if current_time - self.last_frame_update > self.animation_delay:
             self.current_frame = (self.current_frame + 1) % self.frame_count
             self.last_frame_update = current_time
@@ -839,16 +953,9 @@ class Gun(MySprite):
         distance = (dx**2 + dy**2)**0.5
         
         if distance > 0:
+            # Pre-rotated (and flipped when facing backwards) frame for this angle
             angle = math.degrees(math.atan2(-dy, dx))
-            
-            # Flip if facing opposite direction
-            if angle > 90 or angle < -90:
-                current_frame_image = pygame.transform.flip(self.frames[self.current_frame], False, True)
-            else:
-                current_frame_image = self.frames[self.current_frame]
-            
-            # Rotate image
-            self.image = pygame.transform.rotate(current_frame_image, angle)
+            self.image = self.rotations.get(self.current_frame, angle)
         else:
             self.image = self.frames[self.current_frame]
         
@@ -856,16 +963,26 @@ class Gun(MySprite):
         self.rect = self.image.get_rect(center=self.position)
     
     def fire_at(self, target_position):
-        """Fire a bullet toward the target position."""
-        bullet = Bullet(self.position, target_position, self.bullet_speed, self.damage)
-        self.bullets.add(bullet)
-        self.fire_sound.play()
+        """Fire a bullet toward the target position.
+        
+        Returns the bullet's slot in the projectile system, or None if it could not be fired.
+        """
+        if self.projectiles is None:
+            return None
+        bullet = self.projectiles.spawn(self.position, target_position, self.bullet_speed, self.damage, owner=self)
+        if bullet is not None:
+            self.fire_sound.play()
         return bullet
 
 
 class GunTurret(MySprite, Damageable):
     """A stationary turret that fires bullets at the player."""
     
+    DAMAGE_TINT = (255, 0, 0, 100)  # Red with 100 alpha, added to the gun image while hurt
+    
+    # Tinted variants of the gun images are shared by every turret as ("tint", gun image)
+    # derived assets of the ResourceManager, which never evicts them during play
+    
     def __init__(self, position=(0, 0), fire_rate=2000, bullet_speed=3, damage=1, health=3):
         super().__init__()
         self.position = position
@@ -898,9 +1015,12 @@ class GunTurret(MySprite, Damageable):
         """Take damage and handle turret destruction."""
         self.health -= damage
         self.is_hurt = True
-        self.hurt_timer = pygame.time.get_ticks()
+        self.hurt_timer = sim_clock.get_ticks()
         
         if self.health <= 0:
+            # Its bullets go with it
+            if self.gun.projectiles is not None:
+                self.gun.projectiles.clear(self.gun)
             self.kill()
     
     def _update_hurt_effect(self):
@@ -908,7 +1028,7 @@ class GunTurret(MySprite, Damageable):
         if not self.is_hurt:
             return
             
-        current_time = pygame.time.get_ticks()
+        current_time = sim_clock.get_ticks()
         if current_time - self.hurt_timer > self.hurt_effect_duration:
             self.is_hurt = False
             return
@@ -923,21 +1043,25 @@ class GunTurret(MySprite, Damageable):
     
     def _apply_damage_tint(self):
         """Apply a red tint to the turret to show damage."""
-        # Create a copy of the current image 
-        tinted_image = self.gun.image.copy()
-        
-        # Create a red overlay surface
-        overlay = pygame.Surface(tinted_image.get_size(), pygame.SRCALPHA)
-        overlay.fill((255, 0, 0, 100))  # Red with 100 alpha (partial transparency)
-        
-        # Apply the overlay
-        tinted_image.blit(overlay, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+        tinted_image = self._get_tinted_image(self.gun.image)
         
         # Update the image while preserving rect position
         old_center = self.rect.center
         self.image = tinted_image
         self.rect = self.image.get_rect(center=old_center)
     
+    @classmethod
+    def _get_tinted_image(cls, image):
+        """Return the red-tinted variant of a gun image, rendering it only the first time."""
+        # Gun images come from the shared rotation cache, so the surface itself is a stable key
+        return ResourceManager.load_derived(("tint", image), lambda: cls._render_tint(image))
+    
+    @classmethod
+    def _render_tint(cls, image):
+        tinted_image = image.copy()
+        tinted_image.fill(cls.DAMAGE_TINT, special_flags=pygame.BLEND_RGBA_ADD)
+        return tinted_image
+    
     def _reset_appearance(self):
         """Reset turret appearance to normal."""
         # Simply use the gun's current image
@@ -958,17 +1082,11 @@ class GunTurret(MySprite, Damageable):
         # Handle hurt effect last to override normal appearance when damaged
         self._update_hurt_effect()
     
-    def get_bullets(self):
-        """Get all bullets from the gun component."""
-        return self.gun.bullets
+    def set_projectile_system(self, projectiles):
+        """Set the ProjectileSystem the turret's gun fires into."""
+        self.gun.projectiles = projectiles
             
     def render(self, surface, camera):
-        """Render the turret and its bullets."""
-        # Render the turret
+        """Render the turret. Its bullets are drawn by their ProjectileSystem."""
         turret_pos = camera.apply(self)
-        surface.blit(self.image, turret_pos)
-        
-        # Render all bullets
-        for bullet in self.gun.bullets:
-            bullet_pos = camera.apply(bullet)
-            surface.blit(bullet.image, bullet_pos)
\ No newline at end of file
+        surface.blit(self.image, turret_pos)
\ No newline at end of file
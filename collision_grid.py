@@ -0,0 +1,77 @@
+import pygame
+
+# -------------------------------------------------
+# CollisionGrid Class: Uniform grid index over the solid tiles of a level
+class CollisionGrid:
+    def __init__(self, rects, cell_size=16):
+        """
+        Builds a tile-indexed grid so collision queries only test nearby solid rects.
+
+        :param rects: List of `pygame.Rect` solid areas (e.g. `Level.get_level_collisions()`).
+        :param cell_size: Size of a grid cell in pixels, normally the level tile size.
+        """
+        self.cell_size = cell_size
+        self.rects = list(rects)
+        self.cells = {}
+        for index, rect in enumerate(self.rects):
+            for cell in self._cells_for(rect):
+                self.cells.setdefault(cell, []).append(index)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def _cells_for(self, rect):
+        """Yields the keys of every cell touched by the given rect"""
+        min_x = rect.left // self.cell_size
+        max_x = (rect.right - 1) // self.cell_size
+        min_y = rect.top // self.cell_size
+        max_y = (rect.bottom - 1) // self.cell_size
+        for cell_y in range(min_y, max_y + 1):
+            for cell_x in range(min_x, max_x + 1):
+                yield (cell_x, cell_y)
+
+    def _candidates(self, rect):
+        """Returns the indices of the rects stored in the cells touched by the given rect"""
+        cells = self.cells
+        min_x = rect.left // self.cell_size
+        max_x = (rect.right - 1) // self.cell_size
+        min_y = rect.top // self.cell_size
+        max_y = (rect.bottom - 1) // self.cell_size
+        if min_x == max_x and min_y == max_y:
+            return cells.get((min_x, min_y), ())
+        candidates = set()
+        for cell_y in range(min_y, max_y + 1):
+            for cell_x in range(min_x, max_x + 1):
+                indices = cells.get((cell_x, cell_y))
+                if indices:
+                    candidates.update(indices)
+        return candidates
+
+    def query(self, rect):
+        """
+        Finds the solid areas overlapping an area.
+
+        Merged rects are clipped to the cells touched by the query, so the result has the
+        same extents as the individual solid tiles overlapping it would have. This keeps
+        collision responses local even when a wall is stored as one long rect.
+
+        :param rect: A `pygame.Rect` in world coordinates.
+        :return: List of the overlapping solid `pygame.Rect`s.
+        """
+        rects = self.rects
+        cell_size = self.cell_size
+        left = rect.left // cell_size * cell_size
+        top = rect.top // cell_size * cell_size
+        cell_bounds = pygame.Rect(left, top,
+                                  ((rect.right - 1) // cell_size + 1) * cell_size - left,
+                                  ((rect.bottom - 1) // cell_size + 1) * cell_size - top)
+        return [rects[index].clip(cell_bounds) for index in self._candidates(rect)
+                if rect.colliderect(rects[index])]
+
+    def collides(self, rect):
+        """Returns True if the given rect overlaps any solid rect"""
+        rects = self.rects
+        for index in self._candidates(rect):
+            if rect.colliderect(rects[index]):
+                return True
+        return False
@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+import time
+import logging
+from level_cache import parse_ldtk, write_cache
+
+
+def level_files_from_config(config_file="levels_config.json"):
+    """Returns the LDtk projects referenced by the levels configuration that exist on disk"""
+    with open(config_file) as f:
+        configs = json.load(f)
+    files = []
+    for config in configs.values():
+        level_file = config.get("level_file")
+        if level_file and level_file not in files:
+            if os.path.exists(level_file):
+                files.append(level_file)
+            else:
+                logging.warning(f"Skipping missing level file: {level_file}")
+    return files
+
+
+def main():
+    # Compile the given projects, or every level of levels_config.json
+    level_files = sys.argv[1:] or level_files_from_config()
+    for level_file in level_files:
+        start = time.perf_counter()
+        level = parse_ldtk(level_file)
+        path = write_cache(level, level_file)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{level_file} -> {path} ({os.path.getsize(path)} bytes, {elapsed:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
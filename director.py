@@ -1,11 +1,21 @@
 import pygame
+import os
 import sys
 import json
-from menu import PauseMenu, MenuScene, SettingsScene, LoseScene, GameSettings, WinScene,InstructionsScene
-from fase import Fase
+from menu import PauseMenu, MenuScene, SettingsScene, LoseScene, GameSettings, WinScene,InstructionsScene, clear_text_cache
+from fase import Fase, LevelConfigLoader
+from loading import LoadingScene, LevelPreloader, level_assets
+from profiler import profiler
+from resource_manager import ResourceManager
+from asset_manifest import MENU_SCENES, load_manifest, scene_assets
 
 # Initial configuration
 INIT_WIDTH, INIT_HEIGHT, FPS = 800, 600, 60
+SIMULATION_HZ = 60  # Fixed rate of the game logic, independent of the frame rate
+MAX_STEPS_PER_FRAME = 5  # Logic steps run at most per frame; older lag is dropped
+IDLE_WAIT_MS = 250  # Longest sleep waiting for input while a static scene has nothing to redraw
+PREFETCH_BUDGET_MS = 2  # Main-thread time per frame spent loading the next level during play
+PREFETCH_MAX_BYTES = 96 * 1024 * 1024  # Memory the next level may take before it is needed
 
 class SceneFactory:
     def __init__(self, director, screen, scenes_registry):
@@ -22,7 +32,8 @@ class SceneFactory:
         return Fase(self.director, self.screen, scene_identifier.config_name) if hasattr(scene_identifier, 'config_name') else scene_identifier.__class__(self.director, self.screen)
 
 class Director:
-    def __init__(self):
+    def __init__(self, simulation_hz=SIMULATION_HZ, max_steps_per_frame=MAX_STEPS_PER_FRAME, background_loading=True,
+                 music=True):
         pygame.init()
         pygame.display.set_caption("Nhembi Survivor")
 
@@ -30,6 +41,20 @@ class Director:
         self.clock, self.running, self.exit_current_scene = pygame.time.Clock(), True, False
         self.current_phase = None
         self.saved_phase_instance = None  # Saves the current level instance
+        self.background_loading = background_loading  # Build levels behind a LoadingScene
+        self.music = music  # Levels play their music
+        self.prefetch = None  # LevelPreloader of the level after the one being played
+
+        # Fixed timestep: scenes are updated in steps of `step_time` ms and rendered with
+        # `interpolation` (0-1), the fraction of a step elapsed since the last update
+        self.step_time = 1000 / simulation_hz
+        self.max_steps_per_frame = max_steps_per_frame
+        self.accumulator = 0
+        self.interpolation = 1.0
+
+        # Per-frame timings: F3 shows the overlay, PROFILE_CSV=<path> records every frame
+        if os.environ.get("PROFILE_CSV"):
+            profiler.start_csv(os.environ["PROFILE_CSV"])
 
         # Game and resource configuration
         self.settings = GameSettings()
@@ -53,10 +78,24 @@ class Director:
 
     def push_scene(self, scene_identifier):
         self.exit_current_scene = True
+        # Scenes keep the assets they use cached while they are on the stack (see `_release_scene`)
+        pinned_assets = self._scene_assets(scene_identifier)
+        if pinned_assets:
+            ResourceManager.pin(pinned_assets)
 
         # If it's a reload and there's a saved instance, use it
         if scene_identifier == self.current_phase and self.saved_phase_instance:
             new_scene = self.saved_phase_instance
+        elif self.background_loading and self._is_level(scene_identifier):
+            preloader = self._take_prefetch(scene_identifier)
+            if preloader is not None and preloader.done:
+                # Prefetched while the previous level was played: no loading screen needed
+                new_scene = Fase(self, self.screen, preloader.level_name, level=preloader.level,
+                                 collision_grid=preloader.collision_grid)
+                preloader.release()
+            else:
+                # Loaded on a worker thread; the LoadingScene hands over to the level when it is ready
+                new_scene = LoadingScene(self, self.screen, scene_identifier, preloader)
         else:
             new_scene = self.scene_factory.create(scene_identifier)
 
@@ -66,6 +105,7 @@ class Director:
 
         if isinstance(new_scene, PauseMenu):
             new_scene.capture_background(self.screen.copy())
+        new_scene.pinned_assets = pinned_assets
 
         self.scene_stack.append(new_scene)
         new_scene.on_enter()
@@ -80,7 +120,57 @@ class Director:
         self.pop_scene()
         new_scene = self.push_scene(scene_identifier)
         if current_player_state is not None:
-            new_scene.jugador.load_state(current_player_state)
+            if isinstance(new_scene, LoadingScene):
+                new_scene.player_state = current_player_state
+            else:
+                new_scene.jugador.load_state(current_player_state)
+
+    def finish_loading(self, loading_scene, fase):
+        """Replaces a LoadingScene with the level it built."""
+        # The level keeps the assets pinned for its loading screen
+        fase.pinned_assets, loading_scene.pinned_assets = loading_scene.pinned_assets, None
+        if self.scene_stack and self.scene_stack[-1] is loading_scene:
+            self.pop_scene()
+        self.exit_current_scene = True
+        self.current_phase = loading_scene.scene_identifier
+        self.saved_phase_instance = fase
+        self.scene_stack.append(fase)
+        fase.on_enter()
+
+    def _update_loading(self):
+        """Gives a LoadingScene on top its load budget, once per frame however many logic steps ran."""
+        if self.scene_stack and isinstance(self.scene_stack[-1], LoadingScene):
+            self.scene_stack[-1].load()
+
+    def _update_prefetch(self):
+        """Loads the next level in the background, a little every frame, while the current one is played."""
+        if not self.background_loading:
+            return
+        # The level being played, also while its pause menu is on top
+        fase = next((scene for scene in reversed(self.scene_stack) if isinstance(scene, Fase)), None)
+        next_level = fase.next_level if fase is not None and self._is_level(fase.next_level) else None
+        if self.prefetch is not None and self.prefetch.level_name != next_level:
+            self.prefetch.cancel()
+            self.prefetch = None
+        if next_level is None or self.scene_stack[-1] is not fase:
+            return
+        if self.prefetch is None:
+            self.prefetch = LevelPreloader(next_level, PREFETCH_MAX_BYTES)
+            self.prefetch.start()
+        self.prefetch.poll(PREFETCH_BUDGET_MS)
+
+    def _take_prefetch(self, scene_identifier):
+        """Hands over the prefetch if it is loading the given level"""
+        level_name = getattr(scene_identifier, "config_name", scene_identifier)
+        if self.prefetch is None or self.prefetch.level_name != level_name:
+            return None
+        prefetch, self.prefetch = self.prefetch, None
+        return prefetch
+
+    def _is_level(self, scene_identifier):
+        if isinstance(scene_identifier, str):
+            return self.scenes_registry.get(scene_identifier) is Fase
+        return isinstance(scene_identifier, Fase)
 
     def reload(self):
         self._apply_resolution()
@@ -91,36 +181,118 @@ class Director:
             scene = self.scene_stack.pop()
             if hasattr(scene, "on_exit"):
                 scene.on_exit()
+            self._release_scene(scene)
+
+    def _scene_assets(self, scene_identifier):
+        """What a scene uses: everything its level loads and builds, or a menu's manifest assets"""
+        if self._is_level(scene_identifier):
+            level_name = getattr(scene_identifier, "config_name", scene_identifier)
+            return level_assets(level_name, LevelConfigLoader.load_config(level_name))[0]
+        scene_key = scene_identifier if isinstance(scene_identifier, str) else self._get_scene_key(scene_identifier)
+        if scene_key in MENU_SCENES:
+            return scene_assets(scene_key, load_manifest())
+        return None
+
+    @staticmethod
+    def _release_scene(scene):
+        """Unpins the assets pinned while the scene was on the stack"""
+        if scene.pinned_assets:
+            ResourceManager.unpin(scene.pinned_assets)
+            scene.pinned_assets = None
 
     def restart_scene(self):
         if self.scene_stack:
             self.exit_current_scene = True
-            self.push_scene(self.scene_stack.pop())
+            scene = self.scene_stack.pop()
+            if self.push_scene(scene) is not scene:
+                self._release_scene(scene)
 
     def restart_game(self):
+        for scene in self.scene_stack:
+            self._release_scene(scene)
         self.scene_stack.clear()
         self.saved_phase_instance = None  # 🔹 Clears the saved level state
         self.push_scene("menu")
 
     def game_loop(self):
+        # Time spent loading the scene is not simulated
+        self.clock.tick()
+        self.accumulator = 0
+        if self.scene_stack:
+            self.scene_stack[-1].mark_dirty()  # New or uncovered scene: draw it whole
         while not self.exit_current_scene:
-            delta_time = self.clock.tick(FPS)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.quit_game()
-                    return
-                if self.scene_stack:
-                    self.scene_stack[-1].events(event)
+            self.accumulator += self.clock.tick(FPS)
+            profiler.begin_frame()
+            with profiler.scope("events"):
+                for event in self._get_events():
+                    if event.type == pygame.QUIT:
+                        self.quit_game()
+                        return
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        profiler.toggle_overlay()
+                    elif self.scene_stack:
+                        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                            self.scene_stack[-1].mark_dirty()
+                        self.scene_stack[-1].events(event)
             if self.scene_stack:
-                self.screen.fill((0, 0, 0))
-                self.scene_stack[-1].update(delta_time)
-                self.scene_stack[-1].render(self.screen)
-            pygame.display.flip()
+                with profiler.scope("update"):
+                    self._run_simulation_steps()
+                    self._update_loading()
+                with profiler.scope("prefetch"):
+                    self._update_prefetch()
+                if self.scene_stack:
+                    self._render_scene(self.scene_stack[-1])
+            profiler.end_frame()
+
+    def _get_events(self):
+        """Pending events; waits for the next one when a static scene has nothing to redraw."""
+        scene = self.scene_stack[-1] if self.scene_stack else None
+        if scene is None or not scene.static or scene.dirty or profiler.visible:
+            return pygame.event.get()
+        event = pygame.event.wait(IDLE_WAIT_MS)
+        events = pygame.event.get()
+        if event.type != pygame.NOEVENT:
+            events.insert(0, event)
+        return events
+
+    def _render_scene(self, scene):
+        """Draws the scene; static scenes only when dirty, pushing just their dirty areas."""
+        if scene.static and not scene.dirty and not profiler.visible:
+            return
+        dirty_rects = scene.dirty_rects if scene.static and not profiler.visible else None
+        scene.clear_dirty()
+        self.screen.fill((0, 0, 0))
+        with profiler.scope("render"):
+            scene.render(self.screen)
+        profiler.render(self.screen)
+        with profiler.scope("flip"):
+            if dirty_rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty_rects)
+
+    def _run_simulation_steps(self):
+        """Updates the current scene in fixed steps for the time accumulated since the last frame."""
+        steps = 0
+        while self.accumulator >= self.step_time and self.scene_stack:
+            if steps == self.max_steps_per_frame:
+                # Too far behind: drop the lag instead of spiralling into longer frames
+                self.accumulator %= self.step_time
+                break
+            self.scene_stack[-1].update(self.step_time)
+            self.accumulator -= self.step_time
+            steps += 1
+            if self.exit_current_scene:
+                # The scene changed; the new one starts with a fresh accumulator
+                self.accumulator = 0
+                break
+        self.interpolation = self.accumulator / self.step_time
 
     def run(self):
         while self.running and self.scene_stack:
             self.exit_current_scene = False
             self.game_loop()
+        profiler.stop_csv()
         pygame.quit()
         sys.exit()
 
@@ -138,9 +310,11 @@ class Director:
         # Get the new screen using the GameSettings method
         new_screen = self.settings.apply_resolution(self.screen)
         self.screen = new_screen
+        clear_text_cache()
         # Notify each active scene of the change so they can update their layout if implemented
         for scene in self.scene_stack:
             scene.screen = new_screen
+            scene.mark_dirty()
             # If the scene defines an 'on_resolution_change' method, call it
             if hasattr(scene, 'on_resolution_change'):
                 scene.on_resolution_change(new_screen)
@@ -0,0 +1,225 @@
+"""
+Batched enemy AI.
+
+Instead of every enemy computing its own heading toward the player in Python, the
+steering step gathers all enemy positions into one contiguous NumPy array and computes
+direction vectors, distances, stop masks and facing directions for every enemy at once.
+"""
+
+import numpy as np
+from characters import Direction
+
+DIRECTIONS = tuple(Direction)  # Indexed by direction value
+
+
+class EnemySteering:
+    """Vectorised equivalent of `Enemy.move_cpu` for a whole group of enemies.
+
+    With a `FlowField`, enemies follow the shared path toward the player around walls and
+    only fall back to straight-line steering where the field has no heading for them.
+    """
+
+    def __init__(self, stop_distance=10, capacity=64, flow_field=None):
+        """
+        :param stop_distance: Enemies closer than this to the player stop moving.
+        :param capacity: Initial size of the position buffer, grown when needed.
+        :param flow_field: Optional `FlowField` over the level collision grid.
+        """
+        self.stop_distance = stop_distance
+        self.positions = np.zeros((capacity, 2))
+        self.flow_field = flow_field
+
+    def _gather_positions(self, enemies):
+        """Copies the enemy positions into the contiguous buffer and returns the used part."""
+        count = len(enemies)
+        if count > len(self.positions):
+            self.positions = np.zeros((max(count, 2 * len(self.positions)), 2))
+        positions = self.positions[:count]
+        positions[:] = [enemy.position for enemy in enemies]
+        return positions
+
+    def step(self, enemies, player):
+        """
+        Steers every enemy toward the player.
+
+        :param enemies: Sequence of `Enemy` instances.
+        :param player: The player, whose `position` is the target.
+        """
+        if not enemies:
+            return
+        positions = self._gather_positions(enemies)
+        delta = np.asarray(player.position, dtype=float) - positions
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        moving = distance >= self.stop_distance
+        heading = np.zeros_like(delta)
+        np.divide(delta, distance[:, None], out=heading, where=moving[:, None])
+
+        if self.flow_field is not None:
+            self.flow_field.update(player.position)
+            flow_heading, follow = self.flow_field.sample(positions)
+            follow &= moving
+            heading[follow] = flow_heading[follow]
+
+        # Facing follows Character._handle_vector_movement: the dominant axis wins, x on ties
+        dx, dy = heading[:, 0], heading[:, 1]
+        horizontal = np.abs(dx) >= np.abs(dy)
+        facing = np.where(horizontal,
+                          np.where(dx > 0, Direction.RIGHT, Direction.LEFT),
+                          np.where(dy > 0, Direction.DOWN, Direction.UP))
+
+        for enemy, is_moving, vector, direction in zip(enemies, moving.tolist(), heading.tolist(), facing.tolist()):
+            if is_moving:
+                enemy.movement_vector = tuple(vector)
+                enemy.facing_direction = DIRECTIONS[direction]
+            else:
+                enemy.movement_vector = (0, 0)  # Stop if too close
+
+
+class FlowField:
+    """
+    Shared pathfinding toward the player over the level collision grid.
+
+    A breadth-first distance map is grown from the player's cell through the free cells of
+    a window around it, and every cell stores a unit heading toward its lowest-distance
+    neighbour. It is only rebuilt when the player moves to another cell, and each enemy
+    then reads its next heading from its own cell in O(1).
+
+    Moving the target by one cell changes the distance of nearly every cell of the window,
+    so there is little to repair incrementally; instead the rebuild is spread over updates,
+    `BUILD_STEPS` wavefront steps at a time, while enemies keep following the previous field.
+    """
+
+    # Neighbour offsets as (column, row); diagonals last
+    OFFSETS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+    # Wavefront steps per update (about 0.7 ms); a build over the 97-cell window takes 100
+    # to 200 steps. Counted in steps rather than time so headless runs stay reproducible
+    BUILD_STEPS = 32
+
+    def __init__(self, solid_cells, columns, rows, cell_size=16, radius=48):
+        """
+        :param solid_cells: Row-major bytes, non-zero for solid cells (see `Level.solid_cells`).
+        :param columns: Number of cells per row.
+        :param rows: Number of rows.
+        :param cell_size: Size of a cell in pixels.
+        :param radius: Half size of the window around the player, in cells. Enemies outside
+            it fall back to straight-line steering.
+        """
+        self.free = np.frombuffer(solid_cells, dtype=np.uint8).reshape(rows, columns) == 0
+        self.columns = columns
+        self.rows = rows
+        self.cell_size = cell_size
+        self.radius = radius
+        self.target_cell = None  # Cell of the last target position
+        self.built_cell = None  # Target cell of the field in use
+        self._build = None  # Steps of the field being built, while they last
+        self.origin = (0, 0)  # (row, column) of the window's top-left cell
+        self.heading = np.zeros((0, 0, 2))
+        self.valid = np.zeros((0, 0), dtype=bool)
+
+        offsets = np.array(self.OFFSETS, dtype=float)
+        self.unit_offsets = offsets / np.hypot(offsets[:, 0], offsets[:, 1])[:, None]
+
+    def cells_of(self, positions):
+        """(row, column) arrays of the cells containing the given (x, bottom) positions."""
+        positions = np.asarray(positions)
+        columns = np.floor(positions[:, 0]).astype(np.int64) // self.cell_size
+        rows = (np.ceil(positions[:, 1]).astype(np.int64) - 1) // self.cell_size
+        return rows, columns
+
+    def update(self, target_position, steps=BUILD_STEPS):
+        """
+        Rebuilds the field when the target moves to another cell, a few wavefront steps per
+        call. A build in progress is finished before the next one starts, so the field
+        always catches up with the target; the first field is built at once.
+
+        :param steps: Wavefront steps run at most in this call.
+        :return: True if a new field was installed.
+        """
+        rows, columns = self.cells_of([target_position])
+        self.target_cell = (int(rows[0]), int(columns[0]))
+        if self._build is None:
+            if self.target_cell == self.built_cell:
+                return False
+            self._build = self._build_steps(*self.target_cell)
+        remaining = steps if self.valid.size else -1
+        while remaining:
+            try:
+                next(self._build)
+            except StopIteration:
+                self._build = None
+                return True
+            remaining -= 1
+        return False
+
+    def _build_steps(self, target_row, target_column):
+        """Builds the field for a target cell, yielding after every wavefront step"""
+        row0 = max(0, min(target_row - self.radius, self.rows - 1))
+        column0 = max(0, min(target_column - self.radius, self.columns - 1))
+        row1 = max(row0 + 1, min(target_row + self.radius + 1, self.rows))
+        column1 = max(column0 + 1, min(target_column + self.radius + 1, self.columns))
+        free = self.free[row0:row1, column0:column1].copy()
+        local_row, local_column = target_row - row0, target_column - column0
+        inside = 0 <= local_row < free.shape[0] and 0 <= local_column < free.shape[1]
+
+        # Breadth-first wavefront over the free cells (4-connected)
+        distance = np.full(free.shape, -1, dtype=np.int32)
+        frontier = np.zeros(free.shape, dtype=bool)
+        if inside:
+            free[local_row, local_column] = True
+            distance[local_row, local_column] = 0
+            frontier[local_row, local_column] = True
+        unvisited = free & ~frontier
+        grown = np.empty_like(frontier)
+        step = 0
+        while frontier.any():
+            step += 1
+            grown.fill(False)
+            grown[1:, :] |= frontier[:-1, :]
+            grown[:-1, :] |= frontier[1:, :]
+            grown[:, 1:] |= frontier[:, :-1]
+            grown[:, :-1] |= frontier[:, 1:]
+            np.logical_and(grown, unvisited, out=frontier)
+            unvisited &= ~frontier
+            distance[frontier] = step
+            yield
+
+        # Each cell heads to its closest neighbour; diagonals may not cut wall corners
+        height, width = distance.shape
+        unreached = np.iinfo(np.int32).max
+        padded = np.full((height + 2, width + 2), unreached, dtype=np.int32)
+        padded[1:-1, 1:-1] = np.where(distance >= 0, distance, unreached)
+        padded_free = np.zeros((height + 2, width + 2), dtype=bool)
+        padded_free[1:-1, 1:-1] = free
+        candidates = np.empty((len(self.OFFSETS), height, width), dtype=np.int32)
+        for index, (dc, dr) in enumerate(self.OFFSETS):
+            neighbour = padded[1 + dr:1 + dr + height, 1 + dc:1 + dc + width]
+            if dc and dr:
+                passable = (padded_free[1 + dr:1 + dr + height, 1:1 + width]
+                            & padded_free[1:1 + height, 1 + dc:1 + dc + width])
+                neighbour = np.where(passable, neighbour, unreached)
+            candidates[index] = neighbour
+        best = candidates.argmin(axis=0)
+        best_distance = np.take_along_axis(candidates, best[None], axis=0)[0]
+
+        self.origin = (row0, column0)
+        self.valid = (distance > 0) & (best_distance < distance)
+        self.heading = self.unit_offsets[best]
+        self.built_cell = (target_row, target_column)
+
+    def sample(self, positions):
+        """
+        Looks up the headings of the given (x, bottom) positions.
+
+        :return: (headings, valid) arrays; headings are unit (x, y) vectors and only
+            meaningful where `valid` is True.
+        """
+        rows, columns = self.cells_of(positions)
+        rows -= self.origin[0]
+        columns -= self.origin[1]
+        height, width = self.valid.shape
+        inside = (rows >= 0) & (rows < height) & (columns >= 0) & (columns < width)
+        rows = np.where(inside, rows, 0)
+        columns = np.where(inside, columns, 0)
+        if not self.valid.size:
+            return np.zeros((len(rows), 2)), np.zeros(len(rows), dtype=bool)
+        return self.heading[rows, columns], inside & self.valid[rows, columns]
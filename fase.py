@@ -2,7 +2,7 @@
 import math
 import pygame
 import json
-from menu import GameSettings,_render_text_with_outline
+from menu import GameSettings
 from scene import Scene
 from characters import Rat, Alien, Minotaur, Skeleton, Zombie, Reptilian, Frank, Fatty, Nhembitron, Player, GunTurret
 from pygame.locals import *
@@ -10,6 +10,13 @@ from level import Level
 from camera import Camera
 from resource_manager import ResourceManager
 from minimap import MiniMap
+from collision_grid import CollisionGrid
+from projectiles import ProjectileSystem
+from enemy_ai import EnemySteering, FlowField
+from activity import ActivityScheduler
+from spatial_hash import SpatialHash
+from profiler import profiler
+from sim_clock import sim_clock
 from items import Coin, Tortilla
 
 font = "PressStart2P-Regular.ttf"
@@ -75,7 +82,12 @@ class MusicManager:
 # -------------------------------------------------
 # Class Fase
 class Fase(Scene):
-    def __init__(self, director, screen, config_name):
+    def __init__(self, director, screen, config_name, level=None, collision_grid=None):
+        """
+        :param config_name: Level name from levels_config.json.
+        :param level: The `Level` of the configuration if it was already built (e.g. while loading).
+        :param collision_grid: The `CollisionGrid` of `level`, if it was already built too.
+        """
         super().__init__(director, screen)
         self.screen = screen
         # Load level configuration using LevelConfigLoader
@@ -84,8 +96,12 @@ class Fase(Scene):
         self.resources = ResourceManager()
         self.font = self.resources.load_font(font, 24)
         self.count_font = self.resources.load_font(font, 36)
+        # HUD text drawn from pre-rendered glyph atlases
+        self.help_glyphs = self.resources.load_glyph_font(font, 24, (255, 255, 255))
+        self.help_shadow_glyphs = self.resources.load_glyph_font(font, 24, (0, 0, 0))
+        self.count_glyphs = self.resources.load_glyph_font(font, 36, (255, 255, 255), (0, 0, 0))
         # Initialize the level
-        self.level = Level(self.config["level_file"])
+        self.level = level if level is not None else Level(self.config["level_file"])
         # Configure the camera using GameSettings
         settings = GameSettings()
 
@@ -111,16 +127,19 @@ class Fase(Scene):
             self.level.height
         )
 
+        # Where the moving sprites and the camera were before the last update, so rendering
+        # can interpolate between two fixed logic steps
+        self.previous_positions = {}
+        self.previous_view = self.camera.camera_rect.topleft
+
         # Add help text timing
         self.show_help_text = True
         self.help_text_timer = 5000  # Show for 5 seconds
-        self.help_text_start = pygame.time.get_ticks()
+        self.help_text_start = sim_clock.get_ticks()
 
         # Configure collisions
         self.collisionTiles = self.level.get_level_collisions()
-        self.groupTiles = pygame.sprite.Group()
-        for tile in self.collisionTiles:
-            self.groupTiles.add(Obstacle(tile))
+        self.collision_grid = collision_grid if collision_grid is not None else CollisionGrid(self.collisionTiles, self.level.tile_size)
 
         # Cache level details for minimap to avoid recalculating every frame
         self.minimap_level_details = {
@@ -129,11 +148,7 @@ class Fase(Scene):
 
         # Add performance optimization flags
         self.large_map = self.level.width > 3000 or self.level.height > 3000
-        self.update_frequency = 1  # Update every frame by default
-        if self.large_map:
-            self.update_frequency = 2  # Update every 2 frames
 
-        self.current_frame = 0
         self.enemy_positions_cache = []
         self.last_enemy_update = 0
         self.enemy_update_interval = 100  # ms
@@ -146,7 +161,14 @@ class Fase(Scene):
         # Configure enemies
         self.grupoEnemigos = pygame.sprite.Group()
         self.grupoTurrets = pygame.sprite.Group()  # New group for turrets
-        self.grupoBullets = pygame.sprite.Group()  # New group for bullets
+        self.projectiles = ProjectileSystem(self.collision_grid)  # Bullets of every turret
+        # Batched AI step for all enemies, following a shared flow field around walls
+        self.flow_field = FlowField(self.level.solid_cells, self.level.grid_columns,
+                                    self.level.grid_rows, self.level.grid_size)
+        self.enemy_steering = EnemySteering(flow_field=self.flow_field)
+        # Enemies far from the camera sleep until the player gets close
+        self.activity = ActivityScheduler(self.config.get("activity_margin", 256))
+        self.active_enemies = []
         self.grupoSpritesDinamicos = pygame.sprite.Group(self.jugador)
         enemy_config = self.config["enemies"]
         enemy_types = enemy_config.get("types", [])
@@ -158,6 +180,7 @@ class Fase(Scene):
         for enemy_type, position in zip(enemy_types, enemy_positions):
             enemy = EnemyFactory.create_enemy(enemy_type, position)
             if isinstance(enemy, GunTurret):
+                enemy.set_projectile_system(self.projectiles)
                 self.grupoTurrets.add(enemy)
             else:
                 self.grupoEnemigos.add(enemy)
@@ -180,11 +203,17 @@ class Fase(Scene):
                 self.grupoMonedas.add(coin)
                 self.grupoSprites.add(coin)
 
+        # Enemies and pickups bucketed by position for the contact tests
+        self.spatial_hash = SpatialHash()
+        for sprite in (*self.grupoEnemigos, *self.grupoTortillas, *self.grupoMonedas):
+            self.spatial_hash.insert(sprite)
+
         self.end_level = self.config["coins"]["positions"].__len__()
 
         # Configure next level and music
         self.next_level = self.config.get("next_level", None)
-        self.music = self.config.get("music", None)
+        self.music = self.config.get("music", None) if director.music else None
+        self.musicmgr = None
         if self.music:
             self.musicmgr = MusicManager()
             self.musicmgr.play_music(self.resources, self.music)
@@ -204,25 +233,43 @@ class Fase(Scene):
         if self.music:
             MusicManager.play_music(self.resources, self.music)
         # Start the countdown and visual effect
-        self.countdown_start = pygame.time.get_ticks()
+        self.countdown_start = sim_clock.get_ticks()
         self.countdown_active = True
 
     def on_exit(self):
         """Called when the phase is deactivated (pop)."""
         pygame.mixer.music.stop()
 
+    def _store_previous_positions(self):
+        """Remembers the positions of the player, the awake enemies and the camera before an update."""
+        self.previous_positions = {sprite: sprite.rect.topleft for sprite in (self.jugador, *self.active_enemies)}
+        self.previous_view = self.camera.camera_rect.topleft
+
+    @staticmethod
+    def _interpolate(previous, current, alpha):
+        return (round(previous[0] + (current[0] - previous[0]) * alpha),
+                round(previous[1] + (current[1] - previous[1]) * alpha))
+
+    def _screen_position(self, sprite, alpha):
+        """Top-left screen position of a sprite, interpolated since the last update."""
+        previous = self.previous_positions.get(sprite)
+        x, y = sprite.rect.topleft if previous is None else self._interpolate(previous, sprite.rect.topleft, alpha)
+        return (x - self.camera.camera_rect.x, y - self.camera.camera_rect.y)
+
     def update(self, tiempo):
+        # Gameplay timers run on the simulated time of the fixed logic steps
+        sim_clock.advance(tiempo)
+        self._store_previous_positions()
+
         # If the countdown is active, do not update movements or collisions
         if self.countdown_active:
-            current_time = pygame.time.get_ticks()
+            current_time = sim_clock.get_ticks()
             if current_time - self.countdown_start >= self.countdown_duration:
                 self.countdown_active = False
             return  # Exit without updating game logic
 
         # Normal game update (no longer in countdown)
-        self.current_frame += 1
-        full_update = (self.current_frame % self.update_frequency == 0)
-        current_time = pygame.time.get_ticks()
+        current_time = sim_clock.get_ticks()
         if self.show_help_text and current_time - self.help_text_start > self.help_text_timer:
             self.show_help_text = False
 
@@ -232,48 +279,43 @@ class Fase(Scene):
                 self.enemy_positions_cache.append((enemigo.rect.centerx, enemigo.rect.centery))
             self.last_enemy_update = current_time
 
-        if self.large_map and len(self.grupoEnemigos) > 30:
-            subset_size = len(self.grupoEnemigos) // 3
-            start_idx = (self.current_frame % 3) * subset_size
-            end_idx = min(start_idx + subset_size, len(self.grupoEnemigos))
-            active_enemies = list(self.grupoEnemigos)[start_idx:end_idx]
-            for enemigo in active_enemies:
-                enemigo.move_cpu(self.jugador)
-                if pygame.sprite.collide_rect_ratio(0.5)(self.jugador, enemigo):
-                    if enemigo.current_action != 'hurt':
-                        enemigo.attack()
-                        self.jugador.take_damage(enemigo.get_damage())
-        else:
-            for enemigo in self.grupoEnemigos:
-                enemigo.move_cpu(self.jugador)
-                if pygame.sprite.collide_rect_ratio(0.5)(self.jugador, enemigo):
+        # Sleeping enemies get no AI, movement, collision or animation work
+        with profiler.scope("fase.ai"):
+            active_enemies = self.activity.update(self.camera.camera_rect, self.grupoEnemigos.sprites())
+            self.active_enemies = active_enemies
+
+            self.enemy_steering.step(active_enemies, self.jugador)
+            contact = pygame.sprite.collide_rect_ratio(0.5)
+            for enemigo in self.spatial_hash.query(self.jugador.rect):
+                if enemigo in self.grupoEnemigos and contact(self.jugador, enemigo):
                     if enemigo.current_action != 'hurt':
                         enemigo.attack()
                         self.jugador.take_damage(enemigo.get_damage())
 
-        for sprite in self.grupoSpritesDinamicos:
-            if not isinstance(sprite, GunTurret):
-                sprite.update(self.groupTiles, tiempo)
+        with profiler.scope("fase.movement"):
+            self.jugador.update(self.collision_grid, tiempo)
+            for enemigo in active_enemies:
+                enemigo.update(self.collision_grid, tiempo)
+                if enemigo.alive():
+                    self.spatial_hash.move(enemigo)
+                else:
+                    self.spatial_hash.remove(enemigo)
+
+        with profiler.scope("fase.turrets"):
+            for turret in self.grupoTurrets:
+                turret.update(self.collision_grid, tiempo, self.jugador)
 
-        for turret in self.grupoTurrets:
-            turret.update(self.groupTiles, tiempo, self.jugador)
-            for bullet in turret.gun.bullets:
-                dx = bullet.position[0] - self.jugador.position[0]
-                dy = bullet.position[1] - self.jugador.position[1]
-                distance = (dx ** 2 + dy ** 2) ** 0.5
-                if distance < 40:
-                    self.jugador.take_damage(bullet.damage)
-                    bullet.kill()
+        with profiler.scope("fase.projectiles"):
+            self.projectiles.update(tiempo)
+            for bullet in self.projectiles.hit_test(self.jugador.position, 40):
+                self.jugador.take_damage(int(self.projectiles.damage[bullet]))
+                self.projectiles.kill(bullet)
 
+        nearby = self.spatial_hash.query(self.jugador.rect)
         if self.jugador.attack_in_progress:
-            enemies_hit = pygame.sprite.spritecollide(
-                self.jugador,
-                self.grupoEnemigos,
-                False,
-                collided=pygame.sprite.collide_rect_ratio(1)
-            )
-            for enemy in enemies_hit:
-                enemy.take_damage(1)
+            for enemy in nearby:
+                if enemy in self.grupoEnemigos:
+                    enemy.take_damage(1)
 
         self.camera.update(self.jugador)
 
@@ -283,13 +325,15 @@ class Fase(Scene):
                 self.grupoSpritesDinamicos.remove(enemy)
                 self.grupoSprites.remove(enemy)
 
-        tortillas_collected = pygame.sprite.spritecollide(self.jugador, self.grupoTortillas, dokill=True)
-        for tortilla in tortillas_collected:
+        for tortilla in [item for item in nearby if item in self.grupoTortillas]:
+            tortilla.kill()
+            self.spatial_hash.remove(tortilla)
             self.jugador.heal()
             tortilla.make_sound()
 
-        coins_collected = pygame.sprite.spritecollide(self.jugador, self.grupoMonedas, dokill=True)
-        for coin in coins_collected:
+        for coin in [item for item in nearby if item in self.grupoMonedas]:
+            coin.kill()
+            self.spatial_hash.remove(coin)
             self.jugador.gain_coins(1)
             coin.make_sound()
         self.grupoMonedas.update()
@@ -307,83 +351,85 @@ class Fase(Scene):
                 self.director.change_scene(self.next_level)
 
         self.jugador.update_invincibility()
-        self.musicmgr.update_music_pan(self.screen.get_width(), self.jugador.rect.centerx)
+        if self.musicmgr is not None:
+            self.musicmgr.update_music_pan(self.screen.get_width(), self.jugador.rect.centerx)
 
     def render_game(self, pantalla):
         # Full scene rendering (level, sprites, HUD, minimap, etc.)
         pantalla.fill((0, 0, 0))
-        self.level.draw(pantalla, self.camera)
-
-        if self.large_map and len(self.grupoSprites) > 100:
-            camera_rect = pygame.Rect(self.camera.camera_rect.x, self.camera.camera_rect.y,
-                                      self.camera.screen_width, self.camera.screen_height)
-            buffer = 100
-            visible_area = pygame.Rect(camera_rect.x - buffer, camera_rect.y - buffer,
-                                       camera_rect.width + buffer * 2, camera_rect.height + buffer * 2)
-            for sprite in self.grupoSprites:
-                if visible_area.colliderect(sprite.rect):
-                    pantalla.blit(sprite.image, self.camera.apply(sprite))
-            for turret in self.grupoTurrets:
-                if visible_area.colliderect(turret.rect):
-                    for bullet in turret.gun.bullets:
-                        if visible_area.colliderect(bullet.rect):
-                            pantalla.blit(bullet.image, self.camera.apply(bullet))
-        else:
-            for sprite in self.grupoSprites:
-                pantalla.blit(sprite.image, self.camera.apply(sprite))
-            for turret in self.grupoTurrets:
-                for bullet in turret.gun.bullets:
-                    pantalla.blit(bullet.image, self.camera.apply(bullet))
+        # Draw the world between the last two logic steps
+        alpha = self.director.interpolation
+        view = self.camera.camera_rect.topleft
+        self.camera.camera_rect.topleft = self._interpolate(self.previous_view, view, alpha)
+        with profiler.scope("render.level"):
+            self.level.draw(pantalla, self.camera)
+
+        with profiler.scope("render.sprites"):
+            if self.large_map and len(self.grupoSprites) > 100:
+                camera_rect = pygame.Rect(self.camera.camera_rect.x, self.camera.camera_rect.y,
+                                          self.camera.screen_width, self.camera.screen_height)
+                buffer = 100
+                visible_area = pygame.Rect(camera_rect.x - buffer, camera_rect.y - buffer,
+                                           camera_rect.width + buffer * 2, camera_rect.height + buffer * 2)
+                for sprite in self.grupoSprites:
+                    if visible_area.colliderect(sprite.rect):
+                        pantalla.blit(sprite.image, self._screen_position(sprite, alpha))
+            else:
+                for sprite in self.grupoSprites:
+                    pantalla.blit(sprite.image, self._screen_position(sprite, alpha))
+            self.projectiles.render(pantalla, self.camera, alpha)
 
         if not self.countdown_active:
             self.health_bar.render(pantalla)
             self.coin_bar.render(pantalla)
 
-        if self.minimap.visible:
-            if not self.enemy_positions_cache:
-                enemy_positions = [(enemy.rect.centerx, enemy.rect.centery) for enemy in self.grupoEnemigos]
-            else:
-                enemy_positions = self.enemy_positions_cache
-
-            tortilla_positions = []
-            if self.large_map:
-                tortilla_limit = min(10, len(self.grupoTortillas))
-                for i, tortilla in enumerate(self.grupoTortillas):
-                    if i >= tortilla_limit:
-                        break
-                    tortilla_positions.append(tortilla.rect.midbottom)
-            else:
-                tortilla_positions = [tortilla.rect.midbottom for tortilla in self.grupoTortillas]
-
-            screen_size = (pantalla.get_width(), pantalla.get_height())
-            self.minimap.draw(
-                pantalla,
-                (self.jugador.rect.centerx, self.jugador.rect.centery),
-                enemy_positions,
-                tortilla_positions,
-                screen_size,
-                self.minimap_level_details
-            )
+        with profiler.scope("render.minimap"):
+            if self.minimap.visible:
+                if not self.enemy_positions_cache:
+                    enemy_positions = [(enemy.rect.centerx, enemy.rect.centery) for enemy in self.grupoEnemigos]
+                else:
+                    enemy_positions = self.enemy_positions_cache
+
+                tortilla_positions = []
+                if self.large_map:
+                    tortilla_limit = min(10, len(self.grupoTortillas))
+                    for i, tortilla in enumerate(self.grupoTortillas):
+                        if i >= tortilla_limit:
+                            break
+                        tortilla_positions.append(tortilla.rect.midbottom)
+                else:
+                    tortilla_positions = [tortilla.rect.midbottom for tortilla in self.grupoTortillas]
+
+                screen_size = (pantalla.get_width(), pantalla.get_height())
+                self.minimap.draw(
+                    pantalla,
+                    (self.jugador.rect.centerx, self.jugador.rect.centery),
+                    enemy_positions,
+                    tortilla_positions,
+                    screen_size,
+                    self.minimap_level_details
+                )
 
         if self.show_help_text:
-            help_text = self.font.render("Press 'M' to toggle minimap", True, (255, 255, 255))
-            text_rect = help_text.get_rect(center=(pantalla.get_width() // 2, 50))
-            shadow = self.font.render("Press 'M' to toggle minimap", True, (0, 0, 0))
-            shadow_rect = shadow.get_rect(center=(pantalla.get_width() // 2 + 2, 52))
-            pantalla.blit(shadow, shadow_rect)
-            pantalla.blit(help_text, text_rect)
+            help_text = "Press 'M' to toggle minimap"
+            self.help_shadow_glyphs.draw(pantalla, help_text, center=(pantalla.get_width() // 2 + 2, 52))
+            self.help_glyphs.draw(pantalla, help_text, center=(pantalla.get_width() // 2, 50))
 
         if self.jugador.invincible:
-            shield_rect = self.jugador.shield_image.get_rect(center=self.camera.apply(self.jugador).center)
+            player_rect = self.jugador.rect.copy()
+            player_rect.topleft = self._screen_position(self.jugador, alpha)
+            shield_rect = self.jugador.shield_image.get_rect(center=player_rect.center)
             pantalla.blit(self.jugador.shield_image, shield_rect)
 
+        self.camera.camera_rect.topleft = view
+
     def render(self, pantalla):
         # First, render the full scene
         self.render_game(pantalla)
 
         # If the countdown is active, apply the overlay with the expanding circle and counter
         if self.countdown_active:
-            current_time = pygame.time.get_ticks()
+            current_time = sim_clock.get_ticks()
             elapsed = current_time - self.countdown_start
             seconds_left = math.ceil((self.countdown_duration - elapsed) / 1000)
             radius = (elapsed / self.countdown_duration) * self.max_circle_radius
@@ -396,9 +442,8 @@ class Fase(Scene):
             pantalla.blit(overlay, (0, 0))
 
             # Draw the counter in the center
-            text_surface = _render_text_with_outline(self.count_font, str(seconds_left), (255, 255, 255), (0, 0, 0))
-            text_rect = text_surface.get_rect(center=(pantalla.get_width() // 2, pantalla.get_height() // 2))
-            pantalla.blit(text_surface, text_rect)
+            self.count_glyphs.draw(pantalla, str(seconds_left),
+                                   center=(pantalla.get_width() // 2, pantalla.get_height() // 2))
 
     def events(self, event):
         if event.type == pygame.KEYDOWN:
@@ -421,6 +466,7 @@ class Fase(Scene):
             screen.get_width(),
             screen.get_height()
         )
+        self.previous_view = self.camera.camera_rect.topleft
         self.minimap = MiniMap(
             screen.get_width() - self.minimap_width - 20,
             20,
@@ -431,15 +477,6 @@ class Fase(Scene):
         )
 
 
-# -------------------------------------------------
-# Class Obstacle: Represents solid objects for collisions
-class Obstacle(pygame.sprite.Sprite):
-    def __init__(self, rectangle):
-        super().__init__()
-        self.rect = rectangle
-        # Empty image for efficiency
-        self.image = pygame.Surface((0, 0))
-
 # -------------------------------------------------
 # Class HealthBar: Displays the player's health
 class HealthBar(pygame.sprite.Sprite):
@@ -482,6 +519,7 @@ class CoinBar(pygame.sprite.Sprite):
         self.coins = 0
         self._load_coin_image()
         self.font = self.resources.load_font(font, 28) # Font for the text
+        self.glyphs = self.resources.load_glyph_font(font, 28, (0, 0, 0))
         self.rect = self.image.get_rect(topleft=(x, y))
 
     def _load_coin_image(self):
@@ -499,8 +537,6 @@ class CoinBar(pygame.sprite.Sprite):
 
     def render(self, surface):
         surface.blit(self.image, self.rect)
-        coin_text = self.font.render(str(self.coins), True, (0, 0, 0))
-        text_rect = coin_text.get_rect(topleft=(self.rect.left+13, self.y+10))
-        surface.blit(coin_text, text_rect)
+        self.glyphs.draw(surface, str(self.coins), topleft=(self.rect.left+13, self.y+10))
 
 
@@ -0,0 +1,97 @@
+import string
+import pygame
+
+# -------------------------------------------------
+# GlyphFont Class: Bitmap font composed from a pre-rendered glyph atlas
+class GlyphFont:
+    # Glyphs rasterised up front; anything else is added to the atlas the first time it is drawn
+    CHARACTERS = string.ascii_letters + string.digits + string.punctuation + " "
+
+    def __init__(self, font, color, outline_color=None, outline_width=2):
+        """
+        Renders every glyph of `CHARACTERS` once into an atlas surface, so short HUD
+        strings (counters, help lines) are drawn with one `blits` call from the atlas
+        instead of going through the font rasteriser every frame.
+
+        Glyphs are laid out with their advance from `font.size`, which is exact for
+        monospaced fonts such as PressStart2P.
+
+        :param font: A `pygame.font.Font`, normally from `ResourceManager.load_font`.
+        :param color: Text color.
+        :param outline_color: Optional outline color, drawn like `_render_text_with_outline`.
+        :param outline_width: Outline thickness in pixels.
+        """
+        self.font = font
+        self.color = color
+        self.outline_color = outline_color
+        self.outline_width = outline_width if outline_color is not None else 0
+        self.height = font.get_height() + 2 * self.outline_width
+        self.advances = {}
+        self.areas = {}  # Character -> area of its fill glyph in the atlas
+        self.outline_areas = {}  # Character -> area of its outline glyph in the atlas
+        self.atlas = None
+        self._build(self.CHARACTERS)
+
+    def _build(self, characters):
+        """(Re)builds the atlas with the current glyphs plus `characters`."""
+        characters = list(self.areas) + [character for character in characters if character not in self.areas]
+        outline_width = self.outline_width
+        fills = [self.font.render(character, True, self.color) for character in characters]
+        outlines = []
+        if self.outline_color is not None:
+            for character, fill in zip(characters, fills):
+                outline = self.font.render(character, True, self.outline_color)
+                layer = pygame.Surface((fill.get_width() + 2 * outline_width, fill.get_height() + 2 * outline_width),
+                                       pygame.SRCALPHA)
+                for offset in ((0, 0), (2 * outline_width, 0), (0, 2 * outline_width), (2 * outline_width, 2 * outline_width)):
+                    layer.blit(outline, offset)
+                outlines.append(layer)
+
+        # One row of fill glyphs, then one row of outline glyphs
+        width = max(1, sum(fill.get_width() for fill in fills), sum(layer.get_width() for layer in outlines))
+        atlas = pygame.Surface((width, self.height * 2), pygame.SRCALPHA)
+        x = 0
+        for character, fill in zip(characters, fills):
+            self.areas[character] = atlas.blit(fill, (x, 0))
+            self.advances[character] = self.font.size(character)[0]
+            x += fill.get_width()
+        x = 0
+        for character, layer in zip(characters, outlines):
+            self.outline_areas[character] = atlas.blit(layer, (x, self.height))
+            x += layer.get_width()
+        self.atlas = atlas
+
+    def size(self, text):
+        """(width, height) of `text`, including the outline"""
+        missing = [character for character in text if character not in self.advances]
+        if missing:
+            self._build(missing)
+        return sum(self.advances[character] for character in text) + 2 * self.outline_width, self.height
+
+    def draw(self, surface, text, topleft=None, center=None):
+        """
+        Blits `text` onto `surface` from the glyph atlas.
+
+        :param topleft: Top-left corner of the text.
+        :param center: Center of the text, instead of `topleft`.
+        :return: The `pygame.Rect` covered by the text.
+        """
+        rect = pygame.Rect((0, 0), self.size(text))
+        if center is not None:
+            rect.center = center
+        elif topleft is not None:
+            rect.topleft = topleft
+
+        atlas = self.atlas
+        outline_width = self.outline_width
+        outline_blits = []
+        fill_blits = []
+        x = rect.x
+        for character in text:
+            if self.outline_color is not None:
+                outline_blits.append((atlas, (x, rect.y), self.outline_areas[character]))
+            fill_blits.append((atlas, (x + outline_width, rect.y + outline_width), self.areas[character]))
+            x += self.advances[character]
+        # Every outline goes below every fill, as when the string is rendered at once
+        surface.blits(outline_blits + fill_blits, doreturn=False)
+        return rect
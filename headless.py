@@ -0,0 +1,184 @@
+"""
+Headless simulation runner.
+
+Runs levels from levels_config.json with the SDL dummy video and audio drivers, so it works
+on machines without a screen or sound card, and steps the game logic as fast as possible
+for a number of simulated seconds, reporting the simulation throughput in ticks/second:
+
+    python headless.py                       # every level, 60 simulated seconds, random input
+    python headless.py fase3 --seconds 120 --seed 7
+    python headless.py fase3 --script input.json --render
+    python headless.py --min-tps 500         # exit with status 1 if any level is slower
+
+A script is a JSON list of [steps, keys] pairs, e.g. [[60, "d"], [30, "d space"], [90, "w a"]],
+holding the given keys (pygame key names) for that many logic steps; it loops when it ends.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from pygame.locals import K_w, K_s, K_a, K_d, K_SPACE
+from director import Director
+from sim_clock import sim_clock
+import sprite_atlas
+
+MOVEMENT_KEYS = (K_w, K_s, K_a, K_d)
+
+
+class KeyState:
+    """Stand-in for `pygame.key.get_pressed()` holding a fixed set of pressed keys."""
+
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class RandomInput:
+    """Random walk: holds a random combination of movement keys (and sometimes attack) for a while."""
+
+    def __init__(self, seed=0, hold_steps=30):
+        self.random = random.Random(seed)
+        self.hold_steps = hold_steps
+        self.remaining = 0
+        self.keys = KeyState()
+
+    def next(self):
+        if self.remaining == 0:
+            self.remaining = self.hold_steps
+            pressed = [key for key in MOVEMENT_KEYS if self.random.random() < 0.35]
+            if self.random.random() < 0.25:
+                pressed.append(K_SPACE)
+            self.keys = KeyState(pressed)
+        self.remaining -= 1
+        return self.keys
+
+
+class ScriptedInput:
+    """Replays a list of (steps, keys) entries, looping at the end."""
+
+    def __init__(self, script):
+        self.entries = [(int(steps), KeyState(pygame.key.key_code(name) for name in keys.split()))
+                        for steps, keys in script]
+        if not self.entries:
+            raise ValueError("The input script is empty.")
+        self.index = 0
+        self.remaining = self.entries[0][0]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def next(self):
+        while self.remaining <= 0:
+            self.index = (self.index + 1) % len(self.entries)
+            self.remaining = self.entries[self.index][0]
+        self.remaining -= 1
+        return self.entries[self.index][1]
+
+
+class HeadlessDirector(Director):
+    """Director that keeps a running level on screen and records how it ended instead."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("background_loading", False)  # The level is needed right away
+        kwargs.setdefault("music", False)  # Nothing to hear, and the music files may be missing
+        super().__init__(*args, **kwargs)
+        sprite_atlas.ensure_atlas()  # Same sprites as the game
+        self.outcome = None
+
+    def push_scene(self, scene_identifier):
+        if self.scene_stack:
+            # The level asked for the lose/win screen or the pause menu
+            self.outcome = scene_identifier
+            return self.scene_stack[-1]
+        return super().push_scene(scene_identifier)
+
+    def change_scene(self, scene_identifier):
+        self.outcome = scene_identifier
+
+
+def run_level(level_name, seconds, player_input, render=False):
+    """
+    Simulates a level for `seconds` of game time at uncapped speed. Game time is the
+    simulated clock the level advances every tick, so the same input always gives the
+    same result, however fast the machine is.
+
+    :return: Dictionary with the number of ticks, the wall time and the final state.
+    """
+    sim_clock.reset()
+    director = HeadlessDirector()
+    fase = director.push_scene(level_name)
+    fase.countdown_active = False
+    step_time = director.step_time
+    ticks = round(seconds * 1000 / step_time)
+
+    start = time.perf_counter()
+    tick = 0
+    for tick in range(1, ticks + 1):
+        pygame.event.pump()
+        fase.jugador.move(player_input.next(), K_w, K_s, K_a, K_d, K_SPACE)
+        fase.update(step_time)
+        if render:
+            fase.render(director.screen)
+        if director.outcome is not None:
+            break
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "level": level_name,
+        "ticks": tick,
+        "seconds": elapsed,
+        "ticks_per_second": tick / elapsed if elapsed > 0 else float("inf"),
+        "outcome": director.outcome or "running",
+        "health": fase.jugador.health,
+        "coins": fase.jugador.coins,
+        "enemies": len(fase.grupoEnemigos),
+    }
+    fase.on_exit()
+    return result
+
+
+def playable_levels(config_file="levels_config.json"):
+    """Names of the levels in the configuration whose LDtk project exists"""
+    with open(config_file) as f:
+        configs = json.load(f)
+    return [name for name, config in configs.items() if os.path.exists(config.get("level_file", ""))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run levels without a display and report simulation ticks/second.")
+    parser.add_argument("levels", nargs="*", help="Level names from levels_config.json (default: all playable levels)")
+    parser.add_argument("--seconds", type=float, default=60, help="Simulated seconds per level")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random player input")
+    parser.add_argument("--script", help="JSON input script to replay instead of random input")
+    parser.add_argument("--render", action="store_true", help="Also render every tick to the dummy display")
+    parser.add_argument("--min-tps", type=float, help="Fail if a level simulates fewer ticks/second than this")
+    args = parser.parse_args()
+
+    pygame.init()
+    failed = False
+    for level_name in args.levels or playable_levels():
+        player_input = ScriptedInput.from_file(args.script) if args.script else RandomInput(args.seed)
+        result = run_level(level_name, args.seconds, player_input, args.render)
+        print(f"{result['level']}: {result['ticks']} ticks in {result['seconds']:.2f} s "
+              f"-> {result['ticks_per_second']:.0f} ticks/s "
+              f"(outcome: {result['outcome']}, health {result['health']}, "
+              f"coins {result['coins']}, enemies {result['enemies']})")
+        if args.min_tps is not None and result["ticks_per_second"] < args.min_tps:
+            failed = True
+    pygame.quit()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,192 +1,175 @@
-import json
+import numpy as np
 import pygame
+from resource_manager import ResourceManager, surface_bytes
+
+def merge_solid_cells(solid_cells, columns, rows, tile_size):
+    """
+    Merges a grid of solid cells into maximal axis-aligned rectangles.
+
+    Each row is first split into runs of consecutive solid cells, then runs spanning
+    the same columns in consecutive rows are merged vertically. The rectangles cover
+    exactly the solid cells and never overlap.
+
+    :param solid_cells: Row-major bytes-like object or uint8 array, non-zero for solid cells.
+    :param columns: Number of cells per row.
+    :param rows: Number of rows.
+    :param tile_size: Size of a cell in pixels.
+    :return: List of `pygame.Rect` in pixels.
+    """
+    # Runs of every row, from where the zero-padded rows change between free and solid
+    padded = np.zeros((rows, columns + 2), dtype=np.int8)
+    padded[:, 1:-1] = np.frombuffer(solid_cells, dtype=np.uint8, count=columns * rows).reshape(rows, columns) != 0
+    run_rows, edges = np.nonzero(np.diff(padded, axis=1))
+    row_runs = {}
+    for row, first, end in zip(run_rows[::2].tolist(), edges[::2].tolist(), edges[1::2].tolist()):
+        row_runs.setdefault(row, []).append((first, end - 1))
+
+    merged = []
+    open_rects = {}  # (first column, last column) -> rect still growing downwards
+    for row in range(rows):
+        next_open_rects = {}
+        for run in row_runs.get(row, ()):
+            first, last = run
+            rect = open_rects.pop(run, None)
+            if rect is None:
+                rect = pygame.Rect(first * tile_size, row * tile_size, (last + 1 - first) * tile_size, tile_size)
+            else:
+                rect.height += tile_size
+            next_open_rects[run] = rect
+        # Runs that did not continue in this row are finished
+        merged.extend(open_rects.values())
+        open_rects = next_open_rects
+    merged.extend(open_rects.values())
+    return merged
 
 class Level:
-    def __init__(self, level_file):
-        """ Loads the level from an LDtk file and uses a tileset """
-        self.level_tileset = "./levels/suelos_paredes.png"
-        self.level_decorations = "./levels/muebles.png"
-        self.tileset_image = pygame.image.load(self.level_tileset).convert_alpha()
-        self.tileset_decorations = pygame.image.load(self.level_decorations).convert_alpha()
+    CHUNK_SIZE = 512  # Size of each baked chunk in pixels
+    TILESET_DIRECTORY = "levels"
+    TILESET = "suelos_paredes.png"
+    DECORATIONS_TILESET = "muebles.png"
+
+    def __init__(self, level_file, bake=True):
+        """
+        Loads the level from an LDtk file and uses a tileset
+
+        :param bake: Whether to bake the static layers right away. Otherwise `bake_steps` has
+                     to be run to the end before the level is drawn.
+        """
+        self.tileset_image = ResourceManager.load_image(self.TILESET, self.TILESET_DIRECTORY)
+        self.tileset_decorations = ResourceManager.load_image(self.DECORATIONS_TILESET, self.TILESET_DIRECTORY)
         self.tile_size = 16  # Tile size in pixels
-        
-        # Add performance flags
-        self.use_tile_batching = False  # Will be set to True for large maps
-        self.tiles_batch_size = 500  # Number of tiles to process in one batch
-        
+
         # Load level data
         self.level_data, self.level_decorations, self.level_collisions = self.load_level(level_file)
-        
-        # Pre-render large maps in chunks to improve performance
-        if self.width > 3000 or self.height > 3000:
-            self.use_tile_batching = True
-            self.prerender_chunks()
-        
-
-    def prerender_chunks(self):
-        """Pre-render map in chunks for better performance on large maps"""
-        # Create chunk size based on screen dimensions (a bit larger to reduce number of chunks)
-        self.chunk_size = 1024  # Size of each chunk in pixels
-        
-        # Calculate number of chunks in each dimension
+
+        # Bake the static layers once so drawing a frame is a handful of chunk blits
+        self.chunk_size = self.CHUNK_SIZE
         self.chunks_x = (self.width + self.chunk_size - 1) // self.chunk_size
         self.chunks_y = (self.height + self.chunk_size - 1) // self.chunk_size
-        
-        # Create a dictionary to store rendered chunks
-        self.chunks = {}
-        
-        # Create a set to track which chunks have been rendered
-        self.rendered_chunks = set()
+        self.floor_chunks = {}
+        self.decoration_chunks = {}
+        self.baked_bytes = 0  # Memory taken by the baked chunks
+        if bake:
+            for _ in self.bake_steps():
+                pass
+
+    def bake_steps(self):
+        """Bakes both static layers, yielding after every chunk so the work can be spread over frames"""
+        yield from self.bake_layer(self.level_data, self.tileset_image, True, self.floor_chunks)
+        yield from self.bake_layer(self.level_decorations, self.tileset_decorations, False, self.decoration_chunks)
 
     def get_chunk_key(self, x, y):
         """Get the key for a chunk based on world coordinates"""
         chunk_x = x // self.chunk_size
         chunk_y = y // self.chunk_size
         return (chunk_x, chunk_y)
-        
-    def render_chunk(self, chunk_x, chunk_y):
-        """Render a specific chunk of the map"""
-        # Create a new surface for this chunk
-        chunk_surface = pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA)
-        
-        # Calculate the world coordinates for this chunk
-        world_x = chunk_x * self.chunk_size
-        world_y = chunk_y * self.chunk_size
-        
-        # Define the area this chunk covers
-        chunk_rect = pygame.Rect(world_x, world_y, self.chunk_size, self.chunk_size)
-        
-        # Draw tiles that fall within this chunk
-        for x, y, src_x, src_y, tile_id in self.level_data:
-            if chunk_rect.collidepoint(x, y):
-                # Adjust coordinates relative to chunk
-                rel_x = x - world_x
-                rel_y = y - world_y
-                tile_rect = pygame.Rect(src_x, src_y, self.tile_size, self.tile_size)
-                chunk_surface.blit(self.tileset_image, (rel_x, rel_y), tile_rect)
-                
-        # Draw decoration tiles in this chunk
-        for x, y, src_x, src_y, tile_id in self.level_decorations:
-            if chunk_rect.collidepoint(x, y):
-                # Adjust coordinates relative to chunk
-                rel_x = x - world_x
-                rel_y = y - world_y
-                tile_rect = pygame.Rect(src_x, src_y, self.tile_size, self.tile_size)
-                chunk_surface.blit(self.tileset_decorations, (rel_x, rel_y), tile_rect)
-        
-        # Save this chunk
-        self.chunks[(chunk_x, chunk_y)] = chunk_surface
-        self.rendered_chunks.add((chunk_x, chunk_y))
-        
-        return chunk_surface
 
-    def load_level(self, level_file):
-        """ Loads level data from an LDtk file (JSON) """
-        with open(level_file, 'r', encoding='utf-8') as f:
-            project = json.load(f)  # Load file as JSON
+    def _create_chunk_surface(self, chunk_key, opaque):
+        """Creates an empty surface covering the given chunk (clipped to the level bounds)"""
+        chunk_x, chunk_y = chunk_key
+        width = min(self.chunk_size, self.width - chunk_x * self.chunk_size)
+        height = min(self.chunk_size, self.height - chunk_y * self.chunk_size)
+        if opaque:
+            # The screen is cleared to black before drawing, so an opaque black base is equivalent
+            surface = pygame.Surface((width, height)).convert()
+            surface.fill((0, 0, 0))
+        else:
+            surface = pygame.Surface((width, height), pygame.SRCALPHA).convert_alpha()
+            surface.fill((0, 0, 0, 0))
+        return surface
+
+    def bake_layer(self, tiles, tileset, opaque, chunks):
+        """
+        Pre-composites a tile layer into a grid of chunk surfaces. This is a generator: it
+        yields after grouping the tiles and after every chunk.
+
+        :param tiles: int32 array of (x, y, src_x, src_y, tile_id) rows of the layer.
+        :param tileset: Tileset surface the tiles are taken from.
+        :param opaque: Whether the chunks are opaque (base layer) or keep per-pixel alpha (overlay layer).
+        :param chunks: Dictionary filled with (chunk_x, chunk_y) -> baked surface. Chunks without tiles are omitted.
+        """
+        if len(tiles) == 0:
+            return
+        # Group the tiles by chunk on the arrays, preserving the layer order inside each chunk
+        chunk_columns = tiles[:, 0] // self.chunk_size
+        chunk_rows = tiles[:, 1] // self.chunk_size
+        chunk_indexes = chunk_rows * self.chunks_x + chunk_columns
+        order = np.argsort(chunk_indexes, kind="stable")
+        chunk_indexes = chunk_indexes[order]
+        bounds = np.flatnonzero(np.diff(chunk_indexes)) + 1
+        starts = [0] + bounds.tolist()
+        ends = bounds.tolist() + [len(order)]
+        yield
 
-        level_data_tileset = []
-        level_data_decorations = []
-        level_collisions = []
+        size = self.tile_size
+        for start, end in zip(starts, ends):
+            chunk_key = divmod(int(chunk_indexes[start]), self.chunks_x)[::-1]
+            part = order[start:end]
+            positions = (tiles[part, :2] - np.array(chunk_key) * self.chunk_size).tolist()
+            sources = tiles[part, 2:4].tolist()
+            blits = [(tileset, position, (src_x, src_y, size, size)) for position, (src_x, src_y) in zip(positions, sources)]
+            surface = self._create_chunk_surface(chunk_key, opaque)
+            surface.blits(blits, doreturn=False)
+            chunks[chunk_key] = surface
+            self.baked_bytes += surface_bytes(surface)
+            yield
+
+    def load_level(self, level_file):
+        """ Loads level data from an LDtk file (through its compiled cache) """
+        level = ResourceManager.load_level(level_file)
 
-        # Get the first level (or search for a specific one by name)
-        level = project["levels"][0]
-        
         # Set level dimensions
-        self.width = level["pxWid"]
-        self.height = level["pxHei"]
-
-        # For large maps, we'll optimize by checking if we need all tiles
-        is_large_map = self.width > 3000 or self.height > 3000
-
-        # Search for the tile layer
-        for layer in level["layerInstances"]:
-            if layer["__identifier"] == "Suelo_paredes" or layer["__identifier"] == "Muebles": 
-                # For large maps, process tiles in batches to avoid memory spikes
-                tiles = layer["gridTiles"]
-                
-                for tile in tiles:
-                    tile_x = tile["px"][0]  # Position in pixels (x)
-                    tile_y = tile["px"][1]  # Position in pixels (y)
-                    tile_src_x = tile["src"][0]  # Position in the tileset (x)
-                    tile_src_y = tile["src"][1]  # Position in the tileset (y)
-                    tile_id = tile["t"]  # Tile ID within the tileset
-
-                    if layer["__identifier"] == "Suelo_paredes":
-                        level_data_tileset.append((tile_x, tile_y, tile_src_x, tile_src_y, tile_id))
-                    else:
-                        level_data_decorations.append((tile_x, tile_y, tile_src_x, tile_src_y, tile_id))
-
-            if layer["__identifier"] == "Collisions": # Check if the layer is "Collisions" (the LDtk identifier for what is seen in the level)
-                # For collision rects on large maps, limit processing
-                tiles = layer["gridTiles"]
-                
-                # For large maps, use a sampling approach to reduce collision rectangles
-                sample_rate = 1
-                if is_large_map:
-                    # For large maps, check collision tiles less frequently
-                    # This is a tradeoff - fewer collision checks for better performance
-                    # The game might have slightly less accurate collisions, but should be acceptable
-                    sample_rate = 2
-                
-                for i, tile in enumerate(tiles):
-                    if is_large_map and i % sample_rate != 0:
-                        continue
-                        
-                    x = tile["px"][0]
-                    y = tile["px"][1]
-                    level_collisions.append(pygame.Rect(x, y, self.tile_size, self.tile_size))
-     
-        return level_data_tileset, level_data_decorations, level_collisions
+        self.width = level.width
+        self.height = level.height
 
+        # Keep the raw collision grid for grid-based consumers (e.g. enemy pathfinding)
+        self.solid_cells = level.solid_cells
+        self.grid_size = level.grid_size
+        self.grid_columns = level.columns
+        self.grid_rows = level.rows
+
+        # Merge the solid collision cells into as few rectangles as possible
+        level_collisions = merge_solid_cells(level.solid_cells, level.columns, level.rows, level.grid_size)
+
+        return level.floor_tiles, level.decoration_tiles, level_collisions
 
     def draw(self, screen, camera):
-        """ Draws the level on the screen based on the Tile Layer """
-        # Get camera's visible area
-        camera_rect = pygame.Rect(camera.camera_rect.x, camera.camera_rect.y, 
-                                 camera.screen_width, camera.screen_height)
-        # Add a buffer zone (one extra tile in each direction)
-        buffer = self.tile_size * 2
-        visible_area = pygame.Rect(camera_rect.x - buffer, camera_rect.y - buffer,
-                                 camera_rect.width + buffer*2, camera_rect.height + buffer*2)
-        
-        # If using tile batching for large maps
-        if self.use_tile_batching:
-            # Get the chunks that are visible in the current view
-            min_chunk_x = max(0, visible_area.left // self.chunk_size)
-            max_chunk_x = min(self.chunks_x - 1, visible_area.right // self.chunk_size)
-            min_chunk_y = max(0, visible_area.top // self.chunk_size)
-            max_chunk_y = min(self.chunks_y - 1, visible_area.bottom // self.chunk_size)
-            
-            # For each visible chunk
-            for chunk_x in range(min_chunk_x, max_chunk_x + 1):
-                for chunk_y in range(min_chunk_y, max_chunk_y + 1):
-                    chunk_key = (chunk_x, chunk_y)
-                    
-                    # If chunk is not rendered yet, render it
-                    if chunk_key not in self.rendered_chunks:
-                        self.render_chunk(chunk_x, chunk_y)
-                    
-                    # Draw the chunk at the appropriate position
-                    chunk_surface = self.chunks[chunk_key]
-                    world_x = chunk_x * self.chunk_size
-                    world_y = chunk_y * self.chunk_size
-                    chunk_rect = pygame.Rect(world_x, world_y, self.chunk_size, self.chunk_size)
-                    screen.blit(chunk_surface, camera.apply_rect(chunk_rect))
-        else:
-            # For smaller maps, use the original tile-by-tile approach
-            # Only draw tiles that are within the visible area
-            for x, y, src_x, src_y, tile_id in self.level_data:
-                tile_pos = pygame.Rect(x, y, self.tile_size, self.tile_size)
-                if visible_area.colliderect(tile_pos):
-                    tile_rect = pygame.Rect(src_x, src_y, self.tile_size, self.tile_size)
-                    screen.blit(self.tileset_image, camera.apply_rect(tile_pos), tile_rect)
-                    
-            for x, y, src_x, src_y, tile_id in self.level_decorations:
-                tile_pos = pygame.Rect(x, y, self.tile_size, self.tile_size)
-                if visible_area.colliderect(tile_pos):
-                    tile_rect = pygame.Rect(src_x, src_y, self.tile_size, self.tile_size)
-                    screen.blit(self.tileset_decorations, camera.apply_rect(tile_pos), tile_rect)
+        """ Draws the baked level layers that intersect the camera view """
+        camera_x, camera_y = camera.camera_rect.x, camera.camera_rect.y
+        min_chunk_x = max(0, camera_x // self.chunk_size)
+        max_chunk_x = min(self.chunks_x - 1, (camera_x + camera.screen_width - 1) // self.chunk_size)
+        min_chunk_y = max(0, camera_y // self.chunk_size)
+        max_chunk_y = min(self.chunks_y - 1, (camera_y + camera.screen_height - 1) // self.chunk_size)
+
+        blits = []
+        for layer in (self.floor_chunks, self.decoration_chunks):
+            for chunk_y in range(min_chunk_y, max_chunk_y + 1):
+                for chunk_x in range(min_chunk_x, max_chunk_x + 1):
+                    chunk_surface = layer.get((chunk_x, chunk_y))
+                    if chunk_surface is not None:
+                        blits.append((chunk_surface, (chunk_x * self.chunk_size - camera_x,
+                                                      chunk_y * self.chunk_size - camera_y)))
+        screen.blits(blits, doreturn=False)
 
     def get_level_collisions(self):
         return self.level_collisions
\ No newline at end of file
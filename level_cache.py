@@ -0,0 +1,188 @@
+"""
+Compiled level cache.
+
+Parsing a 2 MB LDtk project is most of the time it takes to build a `Level`, so the
+data the game actually needs (tile layers and the collision grid) is compiled into a
+small binary file stored next to the project (`kafetaFIK.ldtk` -> `kafetaFIK.ldtkc`)
+and memory-mapped on later loads: the tile arrays and the collision grid of a loaded
+level are numpy views of the mapping, not copies. The cache records the modification time, size and
+SHA-1 of the project it was built from and is rebuilt whenever the project changes.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+CACHE_SUFFIX = "c"
+MAGIC = b"NHLV"
+VERSION = 1
+TILE_FIELDS = 5  # x, y, src_x, src_y, tile_id
+
+# magic, version, little endian flag, source mtime_ns, source size, source sha1,
+# width, height, grid size, columns, rows, floor tile count, decoration tile count
+HEADER = struct.Struct("<4sHBxqq20s7i")
+SOURCE_STAT_OFFSET = 8  # Offset of the source mtime_ns inside the header
+
+FLOOR_LAYER = "Suelo_paredes"
+DECORATION_LAYER = "Muebles"
+COLLISION_LAYER = "Collisions"
+
+
+class CompiledLevel:
+    """Level data needed at runtime, independent of the LDtk project layout."""
+
+    def __init__(self, width, height, grid_size, columns, rows, floor_tiles, decoration_tiles, solid_cells):
+        """
+        :param width: Level width in pixels.
+        :param height: Level height in pixels.
+        :param grid_size: Size of a collision cell in pixels.
+        :param columns: Number of collision cells per row.
+        :param rows: Number of collision rows.
+        :param floor_tiles: int32 array of (x, y, src_x, src_y, tile_id) rows of the floor/wall layer.
+        :param decoration_tiles: int32 array of (x, y, src_x, src_y, tile_id) rows of the furniture layer.
+        :param solid_cells: Row-major uint8 array, 1 for every solid collision cell.
+        """
+        self.width = width
+        self.height = height
+        self.grid_size = grid_size
+        self.columns = columns
+        self.rows = rows
+        self.floor_tiles = floor_tiles
+        self.decoration_tiles = decoration_tiles
+        self.solid_cells = solid_cells
+
+
+def cache_path(level_file):
+    """Returns the path of the compiled cache for an LDtk project"""
+    return level_file + CACHE_SUFFIX
+
+
+def parse_ldtk(level_file):
+    """Builds a `CompiledLevel` from the first level of an LDtk project (JSON)"""
+    with open(level_file, 'r', encoding='utf-8') as f:
+        project = json.load(f)
+
+    level = project["levels"][0]
+    floor_tiles = []
+    decoration_tiles = []
+    grid_size, columns, rows = 16, 0, 0
+    solid_cells = bytearray()
+
+    for layer in level["layerInstances"]:
+        identifier = layer["__identifier"]
+        if identifier in (FLOOR_LAYER, DECORATION_LAYER):
+            tiles = floor_tiles if identifier == FLOOR_LAYER else decoration_tiles
+            for tile in layer["gridTiles"]:
+                tile_x, tile_y = tile["px"]
+                tile_src_x, tile_src_y = tile["src"]
+                tiles.append((tile_x, tile_y, tile_src_x, tile_src_y, tile["t"]))
+        elif identifier == COLLISION_LAYER:
+            grid_size = layer["__gridSize"]
+            columns = layer["__cWid"]
+            rows = layer["__cHei"]
+            solid_cells = bytearray(columns * rows)
+            for tile in layer["gridTiles"]:
+                x, y = tile["px"]
+                solid_cells[(y // grid_size) * columns + x // grid_size] = 1
+
+    return CompiledLevel(level["pxWid"], level["pxHei"], grid_size, columns, rows,
+                         _tile_array(floor_tiles), _tile_array(decoration_tiles),
+                         np.frombuffer(bytes(solid_cells), dtype=np.uint8))
+
+
+def _tile_array(tiles):
+    return np.array(tiles, dtype=np.int32).reshape(-1, TILE_FIELDS)
+
+
+def _hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+def write_cache(level, level_file, digest=None):
+    """Writes the compiled cache of `level` next to `level_file` and returns its path"""
+    source_stat = os.stat(level_file)
+    if digest is None:
+        digest = _hash_file(level_file)
+    header = HEADER.pack(MAGIC, VERSION, sys.byteorder == "little", source_stat.st_mtime_ns,
+                         source_stat.st_size, digest, level.width, level.height, level.grid_size,
+                         level.columns, level.rows, len(level.floor_tiles), len(level.decoration_tiles))
+
+    path = cache_path(level_file)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        for tiles in (level.floor_tiles, level.decoration_tiles):
+            f.write(np.ascontiguousarray(tiles, dtype=np.int32).tobytes())
+        f.write(np.ascontiguousarray(level.solid_cells, dtype=np.uint8).tobytes())
+    os.replace(temp_path, path)
+    return path
+
+
+def read_cache(level_file):
+    """
+    Loads the compiled cache of an LDtk project. The arrays of the level are views of the
+    mapped file, which stays mapped as long as any of them is alive.
+
+    :return: The `CompiledLevel`, or None if there is no cache or it is out of date.
+    """
+    path = cache_path(level_file)
+    try:
+        source_stat = os.stat(level_file)
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        level, touched = _read_mapped(data, level_file, source_stat)
+        if level is None:
+            data.close()
+            return None
+        if touched:
+            # Same content under a new modification time (e.g. a fresh checkout): record it
+            # so the next load does not have to hash the project again
+            with open(path, 'r+b') as f:
+                f.seek(SOURCE_STAT_OFFSET)
+                f.write(struct.pack("<q", source_stat.st_mtime_ns))
+        return level
+    except (OSError, ValueError, TypeError, struct.error) as err:
+        logging.debug(f"Level cache unavailable for {level_file}: {err}")
+        return None
+
+
+def _read_mapped(data, level_file, source_stat):
+    (magic, version, little_endian, mtime_ns, size, digest, width, height, grid_size,
+     columns, rows, floor_count, decoration_count) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or little_endian != (sys.byteorder == "little"):
+        return None, False
+    touched = mtime_ns != source_stat.st_mtime_ns
+    if size != source_stat.st_size or (touched and digest != _hash_file(level_file)):
+        return None, False
+
+    floor_offset = HEADER.size
+    decoration_offset = floor_offset + floor_count * TILE_FIELDS * 4
+    solid_offset = decoration_offset + decoration_count * TILE_FIELDS * 4
+    if len(data) != solid_offset + columns * rows:
+        return None, False
+    layers = [np.frombuffer(data, dtype=np.int32, count=count * TILE_FIELDS, offset=offset).reshape(count, TILE_FIELDS)
+              for count, offset in ((floor_count, floor_offset), (decoration_count, decoration_offset))]
+    solid_cells = np.frombuffer(data, dtype=np.uint8, count=columns * rows, offset=solid_offset)
+
+    return CompiledLevel(width, height, grid_size, columns, rows, layers[0], layers[1], solid_cells), touched
+
+
+def load_compiled_level(level_file):
+    """Loads an LDtk project through its compiled cache, (re)building the cache when needed"""
+    level = read_cache(level_file)
+    if level is not None:
+        return level
+
+    level = parse_ldtk(level_file)
+    try:
+        write_cache(level, level_file)
+    except OSError as err:
+        logging.warning(f"Cannot write level cache for {level_file}: {err}")
+    return level
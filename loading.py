@@ -0,0 +1,306 @@
+"""
+Background level loading.
+
+Building a level reads its LDtk data and decodes the tilesets and the sprite sheets of
+every character type it uses. `LevelPreloader` does the file reads, the level parsing and
+the image decoding on a worker thread; the main thread only converts the decoded images
+to the display format, builds the animation atlases and bakes the level chunks, within a
+time budget per frame. `LoadingScene` drives a preloader behind a progress bar, one `load`
+per frame, and hands off to the finished `Fase`; the director also runs one for the next
+level during play.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+import pygame
+from scene import Scene
+from resource_manager import ResourceManager, asset_bytes
+from characters import AnimationAtlas, Player, Gun, GunTurret
+from projectiles import ProjectileSystem
+from level import Level
+from collision_grid import CollisionGrid
+from asset_manifest import load_manifest, scene_assets
+from fase import Fase, EnemyFactory, LevelConfigLoader, font
+
+LOAD_BUDGET_MS = 8  # Main-thread time per frame spent finishing loaded assets behind a LoadingScene
+
+
+def level_assets(level_name, config):
+    """
+    Lists what building a level loads: the level data, the tilesets and the sprite sheets
+    (or packed atlas pages) of its characters, plus everything else the asset manifest recorded for it,
+    and what it builds from them: the animation atlases and the rotated gun and bullet sprites.
+
+    :param level_name: Level name from levels_config.json.
+    :param config: Its level configuration.
+    :return: (assets, prefixes): the assets as `ResourceManager.load_asset` tuples, followed by
+             the derived ones (see `ResourceManager.DERIVED_KINDS`), and the sprite prefixes of
+             its characters.
+    """
+    prefixes = [Player.IMAGE_PREFIX]
+    derived = [ProjectileSystem.ROTATIONS]
+    for enemy_type in config["enemies"].get("types", []):
+        enemy_class = EnemyFactory.ENEMY_MAP.get(enemy_type)
+        prefix = getattr(enemy_class, "IMAGE_PREFIX", None)
+        if prefix is not None and prefix not in prefixes:
+            prefixes.append(prefix)
+        if enemy_class is GunTurret and Gun.ROTATIONS not in derived:
+            derived.append(Gun.ROTATIONS)
+
+    assets = [("level", config["level_file"]),
+              ("image", Level.TILESET, Level.TILESET_DIRECTORY),
+              ("image", Level.DECORATIONS_TILESET, Level.TILESET_DIRECTORY)]
+    for prefix in prefixes:
+        assets.extend(asset for asset in AnimationAtlas.assets(prefix) if asset not in assets)
+    for asset in scene_assets(level_name, load_manifest()):
+        if asset not in assets:
+            assets.append(asset)
+    assets.extend(AnimationAtlas.asset(prefix) for prefix in prefixes)
+    return assets + derived, prefixes
+
+
+# -------------------------------------------------
+# LevelPreloader Class: Loads the assets of a level on a worker thread
+class LevelPreloader:
+    def __init__(self, level_name, max_bytes=None):
+        """
+        Assets that are already cached are skipped. Nothing is loaded until `start`;
+        the main thread then calls `poll` regularly until it returns True. The last steps
+        build the `Level` itself, baking its chunks a few at a time, and its collision grid.
+
+        :param level_name: Level name from levels_config.json.
+        :param max_bytes: Memory budget of the decoded assets, atlases and baked chunks.
+                          Loading stops once it is used up, until `resume` lifts it.
+        """
+        self.level_name = level_name
+        self.config = LevelConfigLoader.load_config(level_name)
+        self.max_bytes = max_bytes
+        assets, prefixes = level_assets(level_name, self.config)
+        # Kept cached until the level is handed over, even where nothing references them yet
+        self._pinned = assets
+        ResourceManager.pin(assets)
+        # Atlases are built below; the rotated sprites are rendered when the Fase is built
+        assets = [asset for asset in assets
+                  if asset[0] not in ResourceManager.DERIVED_KINDS and not ResourceManager.is_cached(asset)]
+        # The worker decodes what can be decoded off the main thread; fonts and sounds are made by poll
+        self.assets = [asset for asset in assets if asset[0] in ResourceManager.THREAD_SAFE_KINDS]
+        # The level first: if it cannot be read, nothing else is loaded for it
+        self.assets.sort(key=lambda asset: asset[0] != "level")
+        self.main_thread_assets = [asset for asset in assets if asset[0] not in ResourceManager.THREAD_SAFE_KINDS]
+        self.prefixes = [prefix for prefix in prefixes if not AnimationAtlas.is_built(prefix)]
+        self.read = 0  # Assets read by the worker
+        self.stored = 0  # Decoded assets already stored in the caches
+        self.loaded = 0  # Main-thread assets already loaded
+        self.built = 0  # Animation atlases already built
+        self._atlas = None  # Building steps of the next atlas while they last
+        self.failed = []  # Assets the worker could not read
+        self.level = None
+        self._bake = None  # Baking steps of `level` while they last
+        self.collision_grid = None  # `CollisionGrid` of `level`, built after baking
+        self._decoded_bytes = 0  # Counted by the worker
+        self._built_bytes = 0  # Counted by the main thread
+        self._decoded = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    @property
+    def total(self):
+        """Number of steps: assets, atlases, the level and its collision grid"""
+        return len(self.assets) + len(self.main_thread_assets) + len(self.prefixes) + 2
+
+    @property
+    def progress(self):
+        """Fraction (0-1) of the work done"""
+        baked = self.level is not None and self._bake is None
+        return (self.stored + self.loaded + self.built + baked + self.done) / self.total
+
+    @property
+    def done(self):
+        return self.collision_grid is not None
+
+    @property
+    def level_failed(self):
+        """Whether the level data could not be read, so the level cannot be built here"""
+        return ("level", self.config["level_file"]) in self.failed
+
+    @property
+    def used_bytes(self):
+        return self._decoded_bytes + self._built_bytes + (self.level.baked_bytes if self.level else 0)
+
+    @property
+    def over_budget(self):
+        return self.max_bytes is not None and self.used_bytes >= self.max_bytes
+
+    def start(self):
+        """Starts (or restarts, after the budget stopped it) the worker thread"""
+        if self._cancelled.is_set() or self.read == len(self.assets):
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._work, name=f"preload-{self.level_name}", daemon=True)
+            self._thread.start()
+
+    def resume(self):
+        """Lifts the memory budget and carries on loading everything"""
+        self.max_bytes = None
+        self.start()
+
+    def cancel(self):
+        """Stops the worker after the asset it is reading; what was stored stays cached"""
+        self._cancelled.set()
+        self.release()
+
+    def release(self):
+        """Unpins the assets of the level, once the `Fase` using them is built or loading is cancelled"""
+        if self._pinned is not None:
+            ResourceManager.unpin(self._pinned)
+            self._pinned = None
+
+    def _work(self):
+        while self.read < len(self.assets):
+            if self._cancelled.is_set() or self.over_budget:
+                return
+            asset = self.assets[self.read]
+            try:
+                data = ResourceManager.read_asset(asset)
+            except (Exception, SystemExit) as err:
+                # Left to the normal lazy load, which reports the error where it is used
+                logging.debug(f"Cannot preload {asset[1]}: {err}")
+                self.failed.append(asset)
+                data = None
+            if data is not None:
+                self._decoded_bytes += asset_bytes(asset, data)
+            self.read += 1
+            self._decoded.put((asset, data))
+            if self.level_failed:
+                return  # Nothing else is needed; `poll` cancels the loading
+
+    def poll(self, budget_ms=LOAD_BUDGET_MS):
+        """
+        Finishes loading on the main thread: converts the decoded images and stores
+        everything in the `ResourceManager` caches, loads the fonts and sounds, then builds the
+        animation atlases and finally the level.
+
+        :param budget_ms: Time after which it returns, even with work left.
+        :return: True when everything is loaded.
+        """
+        deadline = time.perf_counter() + budget_ms / 1000
+        while self.stored < len(self.assets):
+            try:
+                asset, data = self._decoded.get_nowait()
+            except queue.Empty:
+                if not self.over_budget:
+                    self.start()  # After `resume`, the worker the budget stopped has to be restarted
+                return False
+            if data is not None:
+                ResourceManager.add_asset(asset, data)
+            elif asset[0] == "level":
+                # The level cannot be built here: stop loading what it would use and unpin it
+                self.cancel()
+                return False
+            self.stored += 1
+            if time.perf_counter() >= deadline:
+                return self.done
+
+        while self.loaded < len(self.main_thread_assets):
+            asset = self.main_thread_assets[self.loaded]
+            try:
+                data = ResourceManager.load_asset(asset)
+                self._built_bytes += asset_bytes(asset, data)
+            except (Exception, SystemExit) as err:
+                logging.debug(f"Cannot preload {asset[1]}: {err}")
+            self.loaded += 1
+            if time.perf_counter() >= deadline:
+                return self.done
+
+        while self.built < len(self.prefixes):
+            if self.over_budget:
+                return False
+            prefix = self.prefixes[self.built]
+            if self._atlas is None:
+                self._atlas = AnimationAtlas.build_steps(prefix)
+            try:
+                next(self._atlas)
+            except StopIteration as stop:
+                self._atlas = None
+                if stop.value is not None:
+                    self._built_bytes += asset_bytes(AnimationAtlas.asset(prefix), stop.value)
+                self.built += 1
+            if time.perf_counter() >= deadline:
+                return self.done
+
+        if self.level is None:
+            if self.over_budget or self.level_failed:
+                return False
+            self.level = Level(self.config["level_file"], bake=False)
+            self._bake = self.level.bake_steps()
+        while self._bake is not None:
+            if self.over_budget:
+                return False
+            try:
+                next(self._bake)
+            except StopIteration:
+                self._bake = None
+                break
+            if time.perf_counter() >= deadline:
+                return False
+
+        if self.collision_grid is None:
+            if time.perf_counter() >= deadline:
+                return False
+            self.collision_grid = CollisionGrid(self.level.get_level_collisions(), self.level.tile_size)
+        return True
+
+
+# -------------------------------------------------
+# LoadingScene Class: Progress screen shown while a level loads
+class LoadingScene(Scene):
+    def __init__(self, director, screen, scene_identifier, preloader=None):
+        """
+        :param scene_identifier: Level name, or the `Fase` being restarted.
+        :param preloader: A `LevelPreloader` of the level already under way (e.g. a prefetch).
+        """
+        super().__init__(director, screen)
+        self.scene_identifier = scene_identifier
+        self.level_name = getattr(scene_identifier, "config_name", scene_identifier)
+        self.preloader = preloader if preloader is not None else LevelPreloader(self.level_name)
+        self.player_state = None  # Restored into the player of the finished level
+        self.glyphs = ResourceManager.load_glyph_font(font, 24, (255, 255, 255))
+
+    def on_enter(self):
+        self.preloader.resume()
+
+    def on_exit(self):
+        self.preloader.cancel()
+
+    def events(self, event):
+        pass
+
+    def update(self, *args):
+        # Loading is budgeted per rendered frame, not per logic step: the director calls `load`
+        pass
+
+    def load(self, budget_ms=LOAD_BUDGET_MS):
+        """Loads for up to `budget_ms`, and hands over to the level once it is built"""
+        if not self.preloader.poll(budget_ms) and not self.preloader.level_failed:
+            return
+        # If the level data could not be read in the background, the Fase loads it and
+        # reports the error as usual
+        fase = Fase(self.director, self.screen, self.level_name, level=self.preloader.level,
+                    collision_grid=self.preloader.collision_grid)
+        self.preloader.release()
+        if self.player_state is not None:
+            fase.jugador.load_state(self.player_state)
+        self.director.finish_loading(self, fase)
+
+    def render(self, screen):
+        width, height = screen.get_size()
+        self.glyphs.draw(screen, "LOADING", center=(width // 2, height // 2 - 30))
+        bar = pygame.Rect(0, 0, width // 2, 20)
+        bar.center = (width // 2, height // 2 + 20)
+        pygame.draw.rect(screen, (255, 255, 255), bar, 2)
+        fill = bar.inflate(-8, -8)
+        fill.width = int(fill.width * self.preloader.progress)
+        pygame.draw.rect(screen, (255, 255, 255), fill)
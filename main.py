@@ -1,9 +1,20 @@
 from director import Director
+from resource_manager import ResourceManager
+from asset_manifest import MENU_SCENES
+import sprite_atlas
 
 
 def main():
     # Create the director instance
     director = Director()
+
+    # Pack the character sprites on the first run, or after they changed
+    sprite_atlas.ensure_atlas()
+
+    # Load the menus' assets before the first frame; the levels are loaded by their loading screen.
+    # The director pins a menu's assets only while it is on the stack
+    for scene_name in MENU_SCENES:
+        ResourceManager.warm_up(scene_name)
     
     # Create and push the initial scene (main menu)
     director.push_scene("menu")
@@ -30,6 +30,8 @@ class UIFactory:
 class UINavigationMixin:
     def handle_ui_navigation(self, event, components):
         if event.type == pygame.KEYDOWN:
+            # Only the selected component (before and after the key) can change on screen
+            self._mark_selected_dirty(components)
             if event.key == pygame.K_w:
                 self._move_selection(-1, components)
             elif event.key == pygame.K_s:
@@ -41,6 +43,11 @@ class UINavigationMixin:
             elif event.key == pygame.K_RETURN:
                 if 0 <= self.selected_index < len(components):
                     components[self.selected_index].events(event)
+            self._mark_selected_dirty(components)
+
+    def _mark_selected_dirty(self, components):
+        if 0 <= self.selected_index < len(components):
+            self.mark_dirty(components[self.selected_index].drawn_rect())
 
     def _move_selection(self, direction, components):
         if 0 <= self.selected_index < len(components):
@@ -113,6 +120,11 @@ class GameSettings:
 class UIComponent(ABC):
     def __init__(self):
         self.selected = False
+        self.rect = None  # Area drawn by the last render
+
+    def drawn_rect(self):
+        """Screen area covered by the component, or None (whole screen) before its first render."""
+        return self.rect
 
     @abstractmethod
     def events(self, event):
@@ -142,6 +154,10 @@ class Slider(UIComponent):
         self.color = color
         self.bg_color = bg_color
 
+    def drawn_rect(self):
+        # The thumb sticks out 5 pixels above and below the bar
+        return self.rect.inflate(0, 10)
+
     def events(self, event):
         if event.type == pygame.KEYDOWN and self.selected:
             if event.key == pygame.K_a:
@@ -183,17 +199,25 @@ class Dropdown(UIComponent):
     def update(self):
         pass
 
+    @staticmethod
+    def _label(option):
+        return "FULL" if option == "FULL" else f"{option[0]}x{option[1]}"
+
+    def drawn_rect(self):
+        # Wide enough for every option, since the text changes with the selection
+        if self.rect is None:
+            return None
+        width = max(self.font.size(self._label(option))[0] for option in self.options) + 4
+        return pygame.Rect(self.x, self.y, max(width, self.rect.width), self.rect.height)
+
     def render(self, surface):
         res = self.options[self.selected_index]
-        if res == "FULL":
-            option_text = _render_text_with_outline(self.font, "FULL", self.text_color, (0, 0, 0))
-        else:
-            option_text = _render_text_with_outline(self.font, f"{res[0]}x{res[1]}", self.text_color, (0, 0, 0))
+        option_text = _render_text_with_outline(self.font, self._label(res), self.text_color, (0, 0, 0))
         surface.blit(option_text, (self.x, self.y))
         surface.blit(option_text, (self.x, self.y))    
+        self.rect = option_text.get_rect(topleft=(self.x, self.y))
         if self.selected:
-            rect = option_text.get_rect(topleft=(self.x, self.y))
-            pygame.draw.rect(surface, (255, 255, 0), rect, 2)
+            pygame.draw.rect(surface, (255, 255, 0), self.rect, 2)
 
 
 # -------------------------------
@@ -208,7 +232,6 @@ class Button(UIComponent):
         self.callback = callback
         self.font = font
         self.text_color = text_color
-        self.rect = None
 
     def events(self, event):
         if event.type == pygame.KEYDOWN and self.selected:
@@ -229,6 +252,8 @@ class Button(UIComponent):
 # Settings Screen
 # -------------------------------
 class SettingsScene(Scene, UINavigationMixin):
+    static = True
+
     def __init__(self, director, screen):
         super().__init__(director, screen)
         self.resources = ResourceManager()
@@ -343,6 +368,8 @@ class SettingsScene(Scene, UINavigationMixin):
 # Pause Menu
 # -------------------------------
 class PauseMenu(Scene, UINavigationMixin):
+    static = True
+
     def __init__(self, director, screen):
         super().__init__(director, screen)
         self.screen = screen
@@ -461,6 +488,8 @@ class PauseMenu(Scene, UINavigationMixin):
 # Main Menu
 # -------------------------------
 class MenuScene(Scene, UINavigationMixin):
+    static = True
+
     def __init__(self, director, screen):
         super().__init__(director, screen)
         self.director = director
@@ -556,6 +585,8 @@ class MenuScene(Scene, UINavigationMixin):
 # Death Scene
 # -------------------------------
 class LoseScene(Scene,UINavigationMixin):
+    static = True
+
     def __init__(self, director,screen):
         super().__init__(director,screen)
         self.director = director
@@ -634,6 +665,8 @@ class LoseScene(Scene,UINavigationMixin):
 # Win Scene
 # -------------------------------
 class WinScene(Scene,UINavigationMixin):
+    static = True
+
     def __init__(self, director,screen):
         super().__init__(director,screen)
         self.director = director
@@ -703,6 +736,8 @@ class WinScene(Scene,UINavigationMixin):
 
 
 class InstructionsScene(Scene):
+    static = True
+
     def __init__(self, director, screen):
         super().__init__(director, screen)
         self.resources = ResourceManager()
@@ -756,7 +791,23 @@ class InstructionsScene(Scene):
         """Called when the scene is deactivated."""
         pass
 
+# Outlined text surfaces are cached by the ResourceManager as ("text", (font, text, colors,
+# outline width)) derived assets
+
+def clear_text_cache():
+    """Drops every cached outlined text surface (e.g. after a resolution change)."""
+    ResourceManager.clear("text")
+
 def _render_text_with_outline(font, text, text_color, outline_color, outline_width=2):
+    """Returns the outlined text surface, rendering it only the first time.
+
+    The surface is shared by every caller, so it must only be blitted, never drawn on.
+    """
+    key = (font, text, tuple(pygame.Color(text_color)), tuple(pygame.Color(outline_color)), outline_width)
+    return ResourceManager.load_derived(
+        ("text", key), lambda: _render_outline(font, text, text_color, outline_color, outline_width))
+
+def _render_outline(font, text, text_color, outline_color, outline_width):
     base = font.render(text, True, text_color)
     outline = font.render(text, True, outline_color)
     w = base.get_width() + 2 * outline_width
@@ -767,4 +818,4 @@ def _render_text_with_outline(font, text, text_color, outline_color, outline_wid
     img.blit(outline, (0, 2 * outline_width))
     img.blit(outline, (2 * outline_width, 2 * outline_width))
     img.blit(base, (outline_width, outline_width))
-    return img
\ No newline at end of file
+    return img
@@ -1,5 +1,6 @@
 import pygame
 from resource_manager import ResourceManager
+from sim_clock import sim_clock
 
 font = "PressStart2P-Regular.ttf"
 
@@ -41,7 +42,7 @@ class MiniMap:
 
     def toggle_visibility(self):
         """Toggle the visibility of the minimap if cooldown has elapsed"""
-        current_time = pygame.time.get_ticks()
+        current_time = sim_clock.get_ticks()
         if current_time - self.toggle_cooldown > self.toggle_cooldown_max:
             self.visible = not self.visible
             self.toggle_cooldown = current_time
@@ -56,7 +57,7 @@ class MiniMap:
             level_decorations: Optional decoration tile data
         """
         # Check if we can use cache
-        if self.map_cache is not None and collision_rects == self.last_collision_rects and not self.force_redraw:
+        if self.map_cache is not None and collision_rects is self.last_collision_rects and not self.force_redraw:
             self.surface.blit(self.map_cache, (0, 0))
             return
             
@@ -67,18 +68,9 @@ class MiniMap:
         scale_x = self.width / self.map_width
         scale_y = self.height / self.map_height
         
-        # Simplify collision_rects processing for large maps
-        # For maps larger than 3000 pixels, we'll sample every nth rectangle
-        sample_rate = 1
-        if self.map_width > 3000 or self.map_height > 3000:
-            sample_rate = 3
-            
-        # Process collision rects at the sampling rate
+        # Collision rects are already merged at level load, so every one of them is drawn
         visible_rects = []
-        for i, rect in enumerate(collision_rects):
-            if i % sample_rate != 0:
-                continue
-                
+        for rect in collision_rects:
             mini_width = max(1, int(rect.width * scale_x))
             mini_height = max(1, int(rect.height * scale_y))
             # Skip very small rects that won't be visible
@@ -116,7 +108,7 @@ class MiniMap:
             return
             
         # Check update frequency to avoid redrawing every frame
-        current_time = pygame.time.get_ticks()
+        current_time = sim_clock.get_ticks()
         should_update_minimap = current_time - self.last_update_time > self.update_frequency
         
         if not should_update_minimap:
@@ -205,7 +197,7 @@ class MiniMap:
 
         # Add a simplified radar pulse effect that uses less CPU - only on smaller maps
         if self.map_width <= 3000:
-            pulse_time = pygame.time.get_ticks() % 2000
+            pulse_time = sim_clock.get_ticks() % 2000
             if pulse_time < 1000:  # Only active half the time
                 pulse_size = pulse_time / 1000 * 15  # 0-15 px pulse
                 pygame.draw.circle(self.surface, (0, 255, 0, 50), (player_mini_x, player_mini_y), pulse_size, 1)
@@ -0,0 +1,183 @@
+"""
+Per-frame timing instrumentation.
+
+Code wraps the phases of a frame in named scopes:
+
+    with profiler.scope("render.level"):
+        self.level.draw(pantalla, self.camera)
+
+and the director brackets every frame with `begin_frame`/`end_frame`. The profiler keeps
+a rolling window of per-frame milliseconds for every scope (min/avg/p99), draws them as
+an on-screen overlay with a frame-time graph (toggled with F3) and can write every
+frame's timings to a CSV file (`start_csv`, or the PROFILE_CSV environment variable).
+
+While neither the overlay nor the CSV output is active, `scope` returns a shared no-op
+context manager, so the instrumentation costs next to nothing.
+"""
+
+import csv
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import pygame
+from resource_manager import ResourceManager
+
+FRAME_BUDGET_MS = 1000 / 60
+_NULL_SCOPE = nullcontext()
+
+
+class _Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = (time.perf_counter() - self.start) * 1000
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0.0) + elapsed
+        return False
+
+
+class FrameProfiler:
+    """Rolling per-scope frame timings with an overlay and optional CSV output."""
+
+    def __init__(self, history=240):
+        """
+        :param history: Number of frames kept for the statistics and the graph.
+        """
+        self.history = history
+        self.visible = False
+        self.samples = {}  # Scope name -> deque of milliseconds per frame
+        self.frame_times = deque(maxlen=history)
+        self.current = {}  # Milliseconds accumulated by each scope during this frame
+        self.frame_start = None
+        self.frame_index = 0
+        self.csv_file = None
+        self.csv_writer = None
+        self._overlay = None
+        self._overlay_frame = -1
+
+    @property
+    def enabled(self):
+        return self.visible or self.csv_writer is not None
+
+    def toggle_overlay(self):
+        self.visible = not self.visible
+
+    def scope(self, name):
+        """Context manager adding the time spent inside it to the scope `name` for this frame."""
+        if self.frame_start is None:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+            self.current = {}
+        else:
+            self.frame_start = None
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        frame_time = (time.perf_counter() - self.frame_start) * 1000
+        self.frame_start = None
+        self.frame_index += 1
+        self.frame_times.append(frame_time)
+        for name in self.current.keys() - self.samples.keys():
+            self.samples[name] = deque(maxlen=self.history)
+        for name, values in self.samples.items():
+            values.append(self.current.get(name, 0.0))
+
+        if self.csv_writer is not None:
+            self.csv_writer.writerow((self.frame_index, "frame", f"{frame_time:.4f}"))
+            for name, elapsed in self.current.items():
+                self.csv_writer.writerow((self.frame_index, name, f"{elapsed:.4f}"))
+
+    def start_csv(self, path):
+        """Writes the timings of every following frame to `path` (columns: frame, scope, ms)."""
+        self.stop_csv()
+        self.csv_file = open(path, "w", newline="")
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(("frame", "scope", "ms"))
+
+    def stop_csv(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+        self.csv_file = None
+        self.csv_writer = None
+
+    @staticmethod
+    def _stats(values):
+        """(min, avg, p99) of a sequence of milliseconds"""
+        ordered = sorted(values)
+        return ordered[0], sum(ordered) / len(ordered), ordered[int(0.99 * (len(ordered) - 1))]
+
+    def stats(self, name):
+        """(min, avg, p99) milliseconds of a scope over the rolling window, or None"""
+        values = self.frame_times if name == "frame" else self.samples.get(name)
+        return self._stats(values) if values else None
+
+    def render(self, surface):
+        """Draws the overlay in the bottom-left corner of `surface`, if visible."""
+        if not self.visible or not self.frame_times:
+            return
+        # The text only changes a few times per second, the graph every frame
+        if self._overlay is None or self.frame_index - self._overlay_frame >= 15:
+            self._overlay = self._render_text()
+            self._overlay_frame = self.frame_index
+        graph_height = 60
+        width = max(self._overlay.get_width(), self.history) + 8
+        height = self._overlay.get_height() + graph_height + 12
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        panel.blit(self._overlay, (4, 4))
+        self._draw_graph(panel, pygame.Rect(4, height - graph_height - 4, self.history, graph_height))
+        surface.blit(panel, (10, surface.get_height() - height - 10))
+
+    def _render_text(self):
+        font = ResourceManager.load_font(None, 14)
+        frame_min, frame_avg, frame_p99 = self._stats(self.frame_times)
+        cached = ResourceManager.stats()["total"]
+        limit = f" of {cached['max_bytes'] / 2 ** 20:.0f}" if cached["max_bytes"] is not None else ""
+        title = font.render(f"{1000 / frame_avg if frame_avg else 0:.0f} fps of frame work, "
+                            f"assets {cached['bytes'] / 2 ** 20:.0f}{limit} MiB", True, (255, 255, 0))
+        rows = [("ms", "min", "avg", "p99"), ("frame", f"{frame_min:.2f}", f"{frame_avg:.2f}", f"{frame_p99:.2f}")]
+        for name in sorted(self.samples):
+            rows.append((name, *(f"{value:.2f}" for value in self._stats(self.samples[name]))))
+
+        # Name column left aligned, number columns right aligned
+        cells = [[font.render(cell, True, (255, 255, 255)) for cell in row] for row in rows]
+        widths = [max(row[column].get_width() for row in cells) + 12 for column in range(4)]
+        line_height = font.get_linesize()
+        text = pygame.Surface((max(sum(widths), title.get_width()), line_height * (len(cells) + 1)), pygame.SRCALPHA)
+        text.blit(title, (0, 0))
+        for index, row in enumerate(cells, start=1):
+            x = 0
+            for column, cell in enumerate(row):
+                offset = 0 if column == 0 else widths[column] - 12 - cell.get_width()
+                text.blit(cell, (x + offset, index * line_height))
+                x += widths[column]
+        return text
+
+    def _draw_graph(self, surface, area):
+        """Frame times as bars, scaled so twice the 60 FPS budget fills the area."""
+        scale = area.height / (2 * FRAME_BUDGET_MS)
+        budget_y = area.bottom - int(FRAME_BUDGET_MS * scale)
+        for index, frame_time in enumerate(self.frame_times):
+            bar_height = min(area.height, int(frame_time * scale))
+            color = (80, 220, 80) if frame_time <= FRAME_BUDGET_MS else (230, 80, 60)
+            x = area.x + index
+            pygame.draw.line(surface, color, (x, area.bottom - 1), (x, area.bottom - bar_height))
+        pygame.draw.line(surface, (255, 255, 0), (area.x, budget_y), (area.right - 1, budget_y))
+
+
+# Shared instance used by the director and the scenes
+profiler = FrameProfiler()
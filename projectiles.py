@@ -0,0 +1,182 @@
+"""
+Central projectile system.
+
+Every bullet of a level lives in fixed-capacity NumPy arrays (position, velocity, origin,
+damage) instead of being its own sprite. A single `update` call steps all of them,
+removes the ones that went out of range and tests them against the level collision
+tiles in bulk; freed slots go back to a free list, so firing never allocates.
+"""
+
+import math
+import numpy as np
+from characters import RotationCache
+from resource_manager import ResourceManager
+
+
+class ProjectileSystem:
+    # Pre-rotated bullet sprites shared by every projectile system through the ResourceManager
+    ROTATIONS = ("rotations", "bullet.png")
+
+    def __init__(self, collision_grid=None, capacity=256, max_distance=500):
+        """
+        :param collision_grid: `CollisionGrid` of the level, or None to ignore walls.
+        :param capacity: Maximum number of bullets alive at the same time.
+        :param max_distance: Distance in pixels after which a bullet disappears.
+        """
+        self.rotations = ResourceManager.load_derived(
+            self.ROTATIONS, lambda: RotationCache([ResourceManager.load_image(self.ROTATIONS[1])]).prerender())
+
+        self.capacity = capacity
+        self.max_distance_sq = max_distance ** 2
+        self.position = np.zeros((capacity, 2))
+        self.previous_position = np.zeros((capacity, 2))  # Position before the last update
+        self.velocity = np.zeros((capacity, 2))
+        self.origin = np.zeros((capacity, 2))
+        self.size = np.zeros((capacity, 2), dtype=np.int64)  # Size of each bullet image
+        self.half_size = np.zeros((capacity, 2), dtype=np.int64)  # Offset from its center to its top-left
+        self.damage = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.images = [None] * capacity
+        self.owners = [None] * capacity  # Gun that fired each bullet
+        self._step = np.zeros((capacity, 2))  # Scratch buffer for the per-frame displacement
+        self._free = list(range(capacity - 1, -1, -1))  # Free slots, lowest index on top
+
+        self._build_solid_table(collision_grid)
+
+    def __len__(self):
+        return self.capacity - len(self._free)
+
+    def _build_solid_table(self, collision_grid):
+        """Rasterises the collision rects into a summed-area table of solid cells."""
+        self.cell_size = collision_grid.cell_size if collision_grid is not None else 16
+        rects = collision_grid.rects if collision_grid is not None else []
+        columns = max((rect.right for rect in rects), default=0) // self.cell_size + 1
+        rows = max((rect.bottom for rect in rects), default=0) // self.cell_size + 1
+        solid = np.zeros((rows, columns), dtype=np.int32)
+        for rect in rects:
+            solid[rect.top // self.cell_size:(rect.bottom - 1) // self.cell_size + 1,
+                  rect.left // self.cell_size:(rect.right - 1) // self.cell_size + 1] = 1
+        # solid_table[r, c] is the number of solid cells above and left of cell (r, c)
+        self.solid_table = np.zeros((rows + 1, columns + 1), dtype=np.int32)
+        self.solid_table[1:, 1:] = solid.cumsum(axis=0).cumsum(axis=1)
+        self.columns = columns
+        self.rows = rows
+
+    def spawn(self, position, target_position, speed, damage, owner=None):
+        """
+        Fires a bullet from `position` toward `target_position`.
+
+        :param owner: What fired it, so its bullets can be removed with it (see `clear`).
+
+        :return: The slot of the new bullet, or None if the pool is full.
+        """
+        if not self._free:
+            return None
+        index = self._free.pop()
+
+        dx = target_position[0] - position[0]
+        dy = target_position[1] - position[1]
+        distance = math.hypot(dx, dy)
+        if distance > 0:
+            self.velocity[index] = (dx / distance * speed, dy / distance * speed)
+            image = self.rotations.get(0, math.degrees(math.atan2(-dy, dx)))
+        else:
+            self.velocity[index] = (0, 0)
+            image = self.rotations.frames[0]
+
+        self.position[index] = position
+        self.previous_position[index] = position
+        self.origin[index] = position
+        self.size[index] = image.get_size()
+        self.half_size[index] = self.size[index] // 2
+        self.damage[index] = damage
+        self.alive[index] = True
+        self.images[index] = image
+        self.owners[index] = owner
+        return index
+
+    def kill(self, index):
+        """Removes a bullet and returns its slot to the free list."""
+        if self.alive[index]:
+            self.alive[index] = False
+            self.velocity[index] = (0, 0)
+            self.images[index] = None
+            self.owners[index] = None
+            self._free.append(index)
+
+    def clear(self, owner=None):
+        """Removes every bullet, or only those fired by `owner`."""
+        for index in np.flatnonzero(self.alive):
+            if owner is None or self.owners[index] is owner:
+                self.kill(index)
+
+    def _topleft(self, indices, positions=None):
+        """Integer top-left corners of the given bullets' image rects."""
+        if positions is None:
+            positions = self.position[indices]
+        return np.floor(positions).astype(np.int64) - self.half_size[indices]
+
+    def update(self, time):
+        """Moves every bullet and removes those out of range or hitting a wall."""
+        self.previous_position[:] = self.position
+        np.multiply(self.velocity, time, out=self._step)
+        self.position += self._step
+
+        indices = np.flatnonzero(self.alive)
+        if not indices.size:
+            return
+
+        offset = self.position[indices] - self.origin[indices]
+        expired = np.einsum('ij,ij->i', offset, offset) > self.max_distance_sq
+        expired |= self._hits_walls(indices)
+        for index in indices[expired]:
+            self.kill(index)
+
+    def _hits_walls(self, indices):
+        """Vectorised test of the bullets' image rects against the solid cells."""
+        topleft = self._topleft(indices)
+        size = self.size[indices]
+        first = topleft // self.cell_size
+        last = (topleft + size - 1) // self.cell_size
+        # Only the part of each rect inside the level grid can touch a solid cell
+        first_column = np.clip(first[:, 0], 0, self.columns)
+        first_row = np.clip(first[:, 1], 0, self.rows)
+        last_column = np.clip(last[:, 0] + 1, 0, self.columns)
+        last_row = np.clip(last[:, 1] + 1, 0, self.rows)
+        table = self.solid_table
+        solid_count = (table[last_row, last_column] - table[first_row, last_column]
+                       - table[last_row, first_column] + table[first_row, first_column])
+        return solid_count > 0
+
+    def hit_test(self, position, radius):
+        """
+        Finds the bullets closer than `radius` to a point, using squared distances.
+
+        :return: Array of the slots of the bullets hitting the point.
+        """
+        indices = np.flatnonzero(self.alive)
+        if not indices.size:
+            return indices
+        offset = self.position[indices] - position
+        return indices[np.einsum('ij,ij->i', offset, offset) < radius * radius]
+
+    def render(self, surface, camera, interpolation=1.0):
+        """
+        Draws the bullets inside the camera view.
+
+        :param interpolation: Fraction (0-1) of the way from the previous to the current
+            positions at which to draw the bullets.
+        """
+        indices = np.flatnonzero(self.alive)
+        if not indices.size:
+            return
+        previous = self.previous_position[indices]
+        positions = previous + (self.position[indices] - previous) * interpolation
+        topleft = self._topleft(indices, positions) - (camera.camera_rect.x, camera.camera_rect.y)
+        size = self.size[indices]
+        visible = ((topleft[:, 0] < camera.screen_width) & (topleft[:, 1] < camera.screen_height)
+                   & (topleft[:, 0] + size[:, 0] > 0) & (topleft[:, 1] + size[:, 1] > 0))
+        images = self.images
+        surface.blits([(images[index], tuple(corner))
+                       for index, corner in zip(indices[visible].tolist(), topleft[visible].tolist())],
+                      doreturn=False)
@@ -1,91 +1,474 @@
-import json
 import pygame
 import os
+import json
+import time
 import logging
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from level_cache import load_compiled_level
 
 # Logger basic configuration
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s [%(levelname)s] %(message)s")
 
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # Memory the caches may hold before least recently used assets are dropped
+
+def surface_bytes(surface):
+    """Memory taken by the pixels of a surface"""
+    return surface.get_pitch() * surface.get_height()
+
+def sound_bytes(sound):
+    """Memory taken by the decoded samples of a sound"""
+    frequency, size, channels = pygame.mixer.get_init() or (44100, -16, 2)
+    return int(sound.get_length() * frequency) * channels * (abs(size) // 8)
+
+def asset_bytes(asset, data):
+    """
+    Approximate memory taken by a loaded asset.
+
+    :param asset: (kind, *arguments) tuple, see `ResourceManager.load_asset`.
+    :param data: What loading the asset returned.
+    """
+    kind = asset[0]
+    if kind == "image":
+        return surface_bytes(data)
+    if kind == "glyph_font":
+        return surface_bytes(data.atlas)
+    if kind == "sound":
+        return sound_bytes(data)
+    if kind == "coordinates":
+        return len(data)
+    if kind == "level":
+        # As stored in the compiled cache: one byte per cell and five ints per tile
+        return len(data.solid_cells) + 20 * (len(data.floor_tiles) + len(data.decoration_tiles))
+    if kind == "music":
+        return 0  # Streamed from its file while it plays
+    if kind == "atlas":
+        return sum(surface_bytes(frame) for directions in data.frame_surfaces.values()
+                   for frames in directions.values() for frame in frames if frame is not None)
+    if kind == "rotations":
+        return sum(surface_bytes(image) for image in data.rendered())
+    if kind in ("tint", "text"):
+        return surface_bytes(data)
+    # Fonts are read from their file as they are used
+    path = ResourceManager.asset_path(asset)
+    return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+# -------------------------------------------------
+# ResourceCache Class: Cache of one kind of asset, with size accounting and LRU order
+class ResourceCache:
+    def __init__(self, kind, evictable=True):
+        """
+        :param evictable: False for kinds whose entries stay until they are cleared, e.g. those
+                          that cannot be pinned ahead because their keys are only known in play.
+        """
+        self.kind = kind
+        self.evictable = evictable
+        self.entries = OrderedDict()  # Key -> [value, bytes, last use], least recently used first
+        self.pins = {}  # Key -> number of times it is pinned
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def values(self):
+        return [entry[0] for entry in self.entries.values()]
+
+    def get(self, key, tick):
+        """The cached value of `key`, marked as used at `tick`, or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry[2] = tick
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size, tick):
+        if key in self.entries:
+            self.bytes -= self.entries[key][1]
+        self.entries[key] = [value, size, tick]
+        self.entries.move_to_end(key)
+        self.bytes += size
+
+    def remove(self, key):
+        value, size, _ = self.entries.pop(key)
+        self.bytes -= size
+        self.evictions += 1
+        return size
+
+    def clear(self):
+        """Drops every entry; pins are kept"""
+        self.evictions += len(self.entries)
+        self.entries.clear()
+        self.bytes = 0
+
+    def pin(self, key):
+        self.pins[key] = self.pins.get(key, 0) + 1
+
+    def unpin(self, key):
+        count = self.pins.get(key, 0) - 1
+        if count > 0:
+            self.pins[key] = count
+        else:
+            self.pins.pop(key, None)
+
+    def least_recently_used(self):
+        """
+        (last use, key) of the least recently used entry that is not pinned, or None.
+        What is in use has to be pinned by its user: dropping it would free nothing and
+        the next load would make a second copy.
+        """
+        if not self.evictable:
+            return None
+        for key, entry in self.entries.items():
+            if key not in self.pins:
+                return entry[2], key
+        return None
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "pinned": sum(key in self.entries for key in self.pins),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
 # -------------------------------------------------
 # ResourceManager Class: Centralized resource management
 class ResourceManager:
-    _resources = {}
-    _sounds = {}
-    _music = {}
+    # One cache per asset kind, all sharing the memory limit
+    _caches = {kind: ResourceCache(kind) for kind in ("image", "coordinates", "font", "glyph_font", "sound", "music", "level", "sprite_index",
+                                                      "atlas", "rotations", "text")}
+    # Tints are keyed by the gun image they are rendered from, so they cannot be pinned with the
+    # level; there is one per gun image at most, and they are cleared with the gun rotations
+    _caches["tint"] = ResourceCache("tint", evictable=False)
+    _images = _caches["image"]  # Image path -> surface in the display format
+    _coordinates = _caches["coordinates"]  # Coordinates file -> its text
+    _fonts = _caches["font"]  # (font file, size) -> pygame.font.Font
+    _glyph_fonts = _caches["glyph_font"]  # (font file, size, color, outline color) -> GlyphFont
+    _sounds = _caches["sound"]  # Sound file -> pygame.mixer.Sound
+    _music = _caches["music"]  # Music file -> its path
+    _levels = _caches["level"]  # Level file -> CompiledLevel
+    _sprite_indexes = _caches["sprite_index"]  # Index file -> packed sprite atlas index
+    _max_bytes = MAX_CACHE_BYTES
+    _tick = 0  # Counts cache accesses, to order the entries of all caches by last use
     _fx_volume = 0.5
+    _live_sounds = weakref.WeakSet()  # Every sound still in use, cached or evicted, for `set_fx_volume`
+    _requested = None  # Assets requested while recording (see `recording`)
 
     @classmethod
     def set_fx_volume(cls, volume):
         cls._fx_volume = volume
-        for sound in cls._sounds.values():
+        for sound in cls._live_sounds:
             sound.set_volume(volume)
 
     @classmethod
-    def load_image(cls, name):
-        if name in cls._resources:
-            return cls._resources[name]
-        fullname = os.path.join("sprites", name)
+    def set_memory_limit(cls, max_bytes):
+        """Sets how many bytes the caches may hold (None for no limit) and evicts down to it"""
+        cls._max_bytes = max_bytes
+        cls._evict()
+
+    @classmethod
+    def used_bytes(cls):
+        return sum(cache.bytes for cache in cls._caches.values())
+
+    @classmethod
+    def stats(cls):
+        """Entries, bytes, pinned entries, hits, misses and evictions per kind, plus the totals"""
+        stats = {kind: cache.stats() for kind, cache in cls._caches.items()}
+        stats["total"] = {"bytes": cls.used_bytes(), "max_bytes": cls._max_bytes,
+                          **{field: sum(kind_stats[field] for kind_stats in stats.values())
+                             for field in ("entries", "pinned", "hits", "misses", "evictions")}}
+        return stats
+
+    @classmethod
+    def _get(cls, cache, key):
+        cls._tick += 1
+        return cache.get(key, cls._tick)
+
+    @classmethod
+    def _put(cls, asset, value):
+        """Caches the value of an asset, then evicts down to the memory limit"""
+        cls._tick += 1
+        cls._caches[asset[0]].put(cls._cache_key(asset), value, asset_bytes(asset, value), cls._tick)
+        cls._evict()
+        return value
+
+    @classmethod
+    def _evict(cls):
+        """Drops the least recently used assets of all caches until they fit in the memory limit"""
+        if cls._max_bytes is None:
+            return
+        used = cls.used_bytes()
+        while used > cls._max_bytes:
+            candidates = [(entry, cache) for cache in cls._caches.values()
+                          for entry in (cache.least_recently_used(),) if entry is not None]
+            if not candidates:
+                return  # Everything left is pinned or in use
+            (_, key), cache = min(candidates, key=lambda candidate: candidate[0][0])
+            size = cache.remove(key)
+            used -= size
+            logging.debug(f"Evicted {cache.kind} {key} ({size / 1024:.0f} KiB)")
+
+    @classmethod
+    def pin(cls, assets):
+        """
+        Keeps assets cached, even while nothing references them, until they are unpinned
+        as many times. Assets can be pinned before they are loaded.
+        """
+        for asset in assets:
+            cls._caches[asset[0]].pin(cls._cache_key(asset))
+
+    @classmethod
+    def unpin(cls, assets):
+        for asset in assets:
+            cls._caches[asset[0]].unpin(cls._cache_key(asset))
+        cls._evict()
+
+    @classmethod
+    @contextmanager
+    def pinned(cls, assets):
+        """Pins the assets inside the block"""
+        assets = list(assets)
+        cls.pin(assets)
         try:
-            image = pygame.image.load(fullname)
+            yield
+        finally:
+            cls.unpin(assets)
+
+    # Assets are also described as (kind, *arguments) tuples, the arguments of the matching
+    # load_<kind> method: ("image", "AK47.png", "sprites"), ("sound", "glup.mp3"), ...
+    # The read_* methods of the THREAD_SAFE_KINDS only decode files and touch no shared state,
+    # so the level preloader runs them on its worker thread; everything else, including the
+    # add_* methods storing what they read, must run on the main thread. Sounds are not among
+    # them: decoding one while the main thread uses the mixer can block forever
+    THREAD_SAFE_KINDS = ("level", "image", "coordinates", "sprite_index")
+    # Derived assets are built in memory from loaded ones by the code using them: animation
+    # atlases ("atlas", prefix), rotated sprites ("rotations", image), tinted sprites ("tint",
+    # surface) and outlined text ("text", key). They cannot be read or warmed up, and are
+    # cached here so their memory counts toward the limit like any other asset
+    DERIVED_KINDS = ("atlas", "rotations", "tint", "text")
+
+    @classmethod
+    def load_asset(cls, asset):
+        kind, *arguments = asset
+        return getattr(cls, f"load_{kind}")(*arguments)
+
+    @classmethod
+    def read_asset(cls, asset):
+        kind, *arguments = asset
+        return getattr(cls, f"read_{kind}")(*arguments)
+
+    @classmethod
+    def add_asset(cls, asset, data):
+        kind, *arguments = asset
+        return getattr(cls, f"add_{kind}")(*arguments, data)
+
+    @classmethod
+    def load_derived(cls, asset, build):
+        """
+        The cached value of a derived asset, built by calling `build()` and cached on a miss.
+
+        :param asset: (kind, key) tuple, the kind one of DERIVED_KINDS.
+        """
+        value = cls._get(cls._caches[asset[0]], asset[1])
+        if value is None:
+            value = cls._put(asset, build())
+        return value
+
+    @classmethod
+    def add_derived(cls, asset, value):
+        return cls._put(asset, value)
+
+    @classmethod
+    def clear(cls, kind):
+        """Drops every cached asset of a kind (e.g. the rendered text after a resolution change)"""
+        cls._caches[kind].clear()
+
+    @classmethod
+    def is_cached(cls, asset):
+        return cls._cache_key(asset) in cls._caches[asset[0]]
+
+    @classmethod
+    def _cache_key(cls, asset):
+        kind, *arguments = asset
+        if kind == "image":
+            return cls.image_key(*arguments)
+        if kind == "font":
+            return tuple(arguments)
+        if kind == "glyph_font":
+            return cls._glyph_key(*arguments)
+        return arguments[0]
+
+    @staticmethod
+    def asset_path(asset):
+        """File an asset is loaded from, or None for the default font"""
+        kind, name, *arguments = asset
+        if kind == "image":
+            return os.path.join(arguments[0] if arguments else "sprites", name)
+        if kind in ("font", "glyph_font"):
+            return os.path.join("fonts", name) if name is not None else None
+        directory = {"coordinates": "sprites", "sound": "sounds", "music": "music"}.get(kind)
+        return os.path.join(directory, name) if directory else name
+
+    @classmethod
+    @contextmanager
+    def recording(cls):
+        """Collects every asset requested inside the block, in request order, in the yielded list"""
+        requested = []
+        cls._requested = requested
+        try:
+            yield requested
+        finally:
+            cls._requested = None
+
+    @classmethod
+    def _request(cls, asset):
+        if cls._requested is not None and asset not in cls._requested:
+            cls._requested.append(asset)
+
+    @classmethod
+    def warm_up(cls, scene_name, manifest=None, pin=False):
+        """
+        Loads up front every asset a scene uses according to the asset manifest (see
+        asset_manifest.py), so none of them is decoded in the middle of the game.
+
+        :param scene_name: Level name from levels_config.json, or a menu scene ("menu", "pause", ...).
+        :param manifest: Manifest dictionary; by default the one in asset_manifest.json.
+        :param pin: Also pin the assets, so the memory limit never evicts them.
+        :return: List of (asset, bytes, milliseconds) of the assets it loaded; cached ones are skipped.
+        """
+        from asset_manifest import load_manifest, scene_assets
+        report = []
+        start = time.perf_counter()
+        assets = scene_assets(scene_name, manifest if manifest is not None else load_manifest())
+        if pin:
+            cls.pin(assets)
+        for asset in assets:
+            if cls.is_cached(asset):
+                continue
+            asset_start = time.perf_counter()
+            try:
+                data = cls.load_asset(asset)
+            except (Exception, SystemExit) as err:
+                logging.warning(f"Cannot warm up {asset}: {err}")
+                continue
+            report.append((asset, asset_bytes(asset, data), (time.perf_counter() - asset_start) * 1000))
+        total_bytes = sum(size for _, size, _ in report)
+        logging.info(f"Warmed up {scene_name}: {len(report)} assets, {total_bytes / 2 ** 20:.1f} MiB "
+                     f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return report
+
+    @staticmethod
+    def image_key(name, directory="sprites"):
+        return os.path.join(directory, name)
+
+    @staticmethod
+    def read_image(name, directory="sprites"):
+        """Decodes an image file into a surface not yet converted to the display format"""
+        fullname = os.path.join(directory, name)
+        try:
+            return pygame.image.load(fullname)
         except pygame.error as err:
             logging.error(f"Cannot load image: {fullname} - {err}")
             raise SystemExit(err)
-        image = image.convert_alpha()
-        cls._resources[name] = image
-        return image
 
     @classmethod
-    def load_coordinates(cls, name):
-        if name in cls._resources:
-            return cls._resources[name]
+    def add_image(cls, name, directory, image):
+        """Converts a decoded image to the display format and caches it"""
+        return cls._put(("image", name, directory), image.convert_alpha())
+
+    @classmethod
+    def load_image(cls, name, directory="sprites"):
+        cls._request(("image", name, directory))
+        image = cls._get(cls._images, cls.image_key(name, directory))
+        if image is not None:
+            return image
+        return cls.add_image(name, directory, cls.read_image(name, directory))
+
+    @staticmethod
+    def read_coordinates(name):
         fullname = os.path.join("sprites", name)
         try:
             with open(fullname, "r") as file:
-                data = file.read()
+                return file.read()
         except Exception as err:
             logging.error(f"Cannot load coordinates from: {fullname} - {err}")
             raise SystemExit(err)
-        cls._resources[name] = data
-        return data
 
     @classmethod
-    def load_level(cls, level_file):
-        """Loads level data from an LDtk file (JSON)"""
+    def add_coordinates(cls, name, data):
+        return cls._put(("coordinates", name), data)
+
+    @classmethod
+    def load_coordinates(cls, name):
+        cls._request(("coordinates", name))
+        data = cls._get(cls._coordinates, name)
+        if data is not None:
+            return data
+        return cls.add_coordinates(name, cls.read_coordinates(name))
+
+    @staticmethod
+    def read_level(level_file):
+        """Loads level data from an LDtk file, through its compiled cache when it is up to date"""
         try:
-            with open(level_file, 'r', encoding='utf-8') as f:
-                project = json.load(f)
+            return load_compiled_level(level_file)
         except Exception as err:
             logging.error(f"Error loading level file: {level_file} - {err}")
             raise SystemExit(err)
 
-        level_data_tileset = []
-        level_data_decorations = []
-        level_collisions = []
-        level = project["levels"][0]
-
-        for layer in level["layerInstances"]:
-            identifier = layer["__identifier"]
-            if identifier in ("Suelo_paredes", "Muebles"):  # Floors and walls, Furniture
-                for tile in layer["gridTiles"]:
-                    tile_x, tile_y = tile["px"]
-                    tile_src_x, tile_src_y = tile["src"]
-                    tile_id = tile["t"]
-                    if identifier == "Suelo_paredes":
-                        level_data_tileset.append((tile_x, tile_y, tile_src_x, tile_src_y, tile_id))
-                    else:
-                        level_data_decorations.append((tile_x, tile_y, tile_src_x, tile_src_y, tile_id))
-            elif layer["__identifier"] == "Collisions":
-                for tile in layer["gridTiles"]:
-                    x, y = tile["px"]
-                    level_collisions.append(pygame.Rect(x, y, 1, 1))
-
-        return level_data_tileset, level_data_decorations, level_collisions
+    @classmethod
+    def add_level(cls, level_file, level):
+        return cls._put(("level", level_file), level)
+
+    @classmethod
+    def load_level(cls, level_file):
+        cls._request(("level", level_file))
+        level = cls._get(cls._levels, level_file)
+        if level is not None:
+            return level
+        return cls.add_level(level_file, cls.read_level(level_file))
+
+    @staticmethod
+    def read_sprite_index(name):
+        """Reads the index of a packed sprite atlas (see sprite_atlas.py); no index reads as empty"""
+        try:
+            with open(name, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            logging.warning(f"Cannot load sprite atlas index: {name} - {err}")
+            return {}
+
+    @classmethod
+    def add_sprite_index(cls, name, index):
+        return cls._put(("sprite_index", name), index)
+
+    @classmethod
+    def load_sprite_index(cls, name):
+        cls._request(("sprite_index", name))
+        index = cls._get(cls._sprite_indexes, name)
+        if index is not None:
+            return index
+        return cls.add_sprite_index(name, cls.read_sprite_index(name))
 
     @classmethod
     def load_font(cls, name, size):
-        key = (name, size)
-        if key in cls._resources:
-            return cls._resources[key]
+        cls._request(("font", name, size))
+        font = cls._get(cls._fonts, (name, size))
+        if font is not None:
+            return font
         if name is None:
             font = pygame.font.Font(pygame.font.get_default_font(), size)
         else:
@@ -95,32 +478,53 @@ class ResourceManager:
             except Exception as err:
                 logging.error(f"Cannot load font: {fullname} - {err}")
                 raise SystemExit(err)
-        cls._resources[key] = font
-        return font
+        return cls._put(("font", name, size), font)
+
+    @classmethod
+    def load_glyph_font(cls, name, size, color, outline_color=None):
+        """Returns a `GlyphFont` atlas of the given font and colors, built once and shared"""
+        key = cls._glyph_key(name, size, color, outline_color)
+        cls._request(("glyph_font",) + key)
+        glyph_font = cls._get(cls._glyph_fonts, key)
+        if glyph_font is not None:
+            return glyph_font
+        from glyph_font import GlyphFont
+        return cls._put(("glyph_font",) + key, GlyphFont(cls.load_font(name, size), color, outline_color))
+
+    @staticmethod
+    def _glyph_key(name, size, color, outline_color=None):
+        return name, size, tuple(color), tuple(outline_color) if outline_color is not None else None
 
     @classmethod
     def load_music(cls, name):
-        if name in cls._music:
-            return cls._music[name]
+        cls._request(("music", name))
+        fullname = cls._get(cls._music, name)
+        if fullname is not None:
+            return fullname
         fullname = os.path.join("music", name)
         if not os.path.exists(fullname):
             raise FileNotFoundError(f"Music file not found: {fullname}")
-        cls._music[name] = fullname
-        return fullname
+        return cls._put(("music", name), fullname)
 
-    @classmethod
-    def load_sound(cls, name):
-        if name in cls._sounds:
-            return cls._sounds[name]
+    @staticmethod
+    def read_sound(name):
         fullname = os.path.join("sounds", name)
         try:
-            sound = pygame.mixer.Sound(fullname)
-            sound.set_volume(cls._fx_volume)
+            return pygame.mixer.Sound(fullname)
         except Exception as err:
             logging.error(f"Cannot load sound: {fullname} - {err}")
             raise SystemExit(err)
-        cls._sounds[name] = sound
-        return sound
-
 
+    @classmethod
+    def add_sound(cls, name, sound):
+        sound.set_volume(cls._fx_volume)
+        cls._live_sounds.add(sound)
+        return cls._put(("sound", name), sound)
 
+    @classmethod
+    def load_sound(cls, name):
+        cls._request(("sound", name))
+        sound = cls._get(cls._sounds, name)
+        if sound is not None:
+            return sound
+        return cls.add_sound(name, cls.read_sound(name))
@@ -7,10 +7,30 @@ ALTO_PANTALLA = 600
 # Clase Escena con lo metodos abstractos
 
 class Scene:
+    # Static scenes only change in response to input: the director redraws them when they
+    # are dirty and otherwise waits for the next event instead of rendering every frame
+    static = False
 
     def __init__(self, director, screen):
         self.director = director
         self.screen = screen
+        self.dirty = True
+        self.dirty_rects = None  # Areas to update on the display; None means the whole screen
+        self.pinned_assets = None  # Assets the director keeps cached while the scene is on the stack
+
+    def mark_dirty(self, rect=None):
+        """Requests a redraw of the given area of the screen, or of all of it."""
+        if rect is None:
+            self.dirty_rects = None
+        elif not self.dirty:
+            self.dirty_rects = [rect]
+        elif self.dirty_rects is not None:
+            self.dirty_rects.append(rect)
+        self.dirty = True
+
+    def clear_dirty(self):
+        self.dirty = False
+        self.dirty_rects = None
 
     def update(self, *args):
         raise NotImplementedError("You need to implement the method update.")
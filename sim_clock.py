@@ -0,0 +1,27 @@
+"""
+Simulation clock.
+
+Gameplay timers (animation delays, invincibility, fire rates, the countdown, ...) read the
+time from `sim_clock` instead of `pygame.time.get_ticks()`. A level advances it by one
+fixed step on every logic update, so the timers keep pace with the movement, also when the
+director drops steps or the headless runner simulates faster than real time, and the same
+input always plays the same game.
+"""
+
+
+class SimulationClock:
+    def __init__(self):
+        self.time = 0.0  # Simulated milliseconds
+
+    def get_ticks(self):
+        """Simulated milliseconds, like `pygame.time.get_ticks()`"""
+        return int(self.time)
+
+    def advance(self, milliseconds):
+        self.time += milliseconds
+
+    def reset(self):
+        self.time = 0.0
+
+
+sim_clock = SimulationClock()
@@ -0,0 +1,119 @@
+import pygame
+
+# -------------------------------------------------
+# SpatialHash Class: Uniform hash grid over moving sprites (enemies, items)
+class SpatialHash:
+    def __init__(self, cell_size=128):
+        """
+        Buckets sprites by the cells their rect touches so contact tests only look at
+        the sprites around the queried area instead of whole groups.
+
+        Sprites are indexed incrementally: call `move` after a sprite moved (it only
+        re-buckets it when it crossed a cell border) and `remove` when it is gone.
+
+        :param cell_size: Size of a hash cell in pixels, a bit larger than a character.
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self._spans = {}  # Sprite -> (min_x, min_y, max_x, max_y) of the cells holding it
+        self._order = {}  # Sprite -> insertion number, so queries return a stable order
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __contains__(self, sprite):
+        return sprite in self._spans
+
+    def _span(self, rect):
+        """Returns the range of cells touched by the given rect"""
+        cell_size = self.cell_size
+        return (rect.left // cell_size, rect.top // cell_size,
+                max(rect.right - 1, rect.left) // cell_size, max(rect.bottom - 1, rect.top) // cell_size)
+
+    def _add(self, sprite, span):
+        min_x, min_y, max_x, max_y = span
+        for cell_y in range(min_y, max_y + 1):
+            for cell_x in range(min_x, max_x + 1):
+                self.cells.setdefault((cell_x, cell_y), set()).add(sprite)
+
+    def _discard(self, sprite, span):
+        min_x, min_y, max_x, max_y = span
+        for cell_y in range(min_y, max_y + 1):
+            for cell_x in range(min_x, max_x + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket is not None:
+                    bucket.discard(sprite)
+                    if not bucket:
+                        del self.cells[(cell_x, cell_y)]
+
+    def insert(self, sprite):
+        """Adds a sprite at its current rect (or re-buckets it if it is already stored)"""
+        if sprite in self._spans:
+            self.move(sprite)
+            return
+        span = self._span(sprite.rect)
+        self._spans[sprite] = span
+        self._order[sprite] = self._next_order
+        self._next_order += 1
+        self._add(sprite, span)
+
+    def remove(self, sprite):
+        """Removes a sprite; does nothing if it is not stored"""
+        span = self._spans.pop(sprite, None)
+        if span is not None:
+            del self._order[sprite]
+            self._discard(sprite, span)
+
+    def move(self, sprite):
+        """Updates the cells of a stored sprite after its rect changed"""
+        old_span = self._spans[sprite]
+        span = self._span(sprite.rect)
+        if span != old_span:
+            self._discard(sprite, old_span)
+            self._add(sprite, span)
+            self._spans[sprite] = span
+
+    def _candidates(self, rect):
+        """Returns the sprites stored in the cells touched by the given rect"""
+        min_x, min_y, max_x, max_y = self._span(rect)
+        candidates = set()
+        for cell_y in range(min_y, max_y + 1):
+            for cell_x in range(min_x, max_x + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket:
+                    candidates.update(bucket)
+        return candidates
+
+    def query(self, rect):
+        """
+        Finds the sprites whose rect overlaps an area.
+
+        :param rect: A `pygame.Rect` in world coordinates.
+        :return: List of the overlapping sprites, in insertion order.
+        """
+        found = [sprite for sprite in self._candidates(rect) if rect.colliderect(sprite.rect)]
+        found.sort(key=self._order.__getitem__)
+        return found
+
+    def query_radius(self, center, radius):
+        """
+        Finds the sprites whose rect is within a distance of a point.
+
+        :param center: (x, y) point in world coordinates.
+        :param radius: Distance in pixels.
+        :return: List of the sprites in range, in insertion order.
+        """
+        x, y = center
+        bounds = pygame.Rect(x - radius, y - radius, 2 * radius + 1, 2 * radius + 1)
+        radius_sq = radius * radius
+        found = []
+        for sprite in self._candidates(bounds):
+            rect = sprite.rect
+            # Distance from the point to the closest point of the rect
+            dx = max(rect.left - x, 0, x - (rect.right - 1))
+            dy = max(rect.top - y, 0, y - (rect.bottom - 1))
+            if dx * dx + dy * dy <= radius_sq:
+                found.append(sprite)
+        found.sort(key=self._order.__getitem__)
+        return found
@@ -0,0 +1,320 @@
+"""
+Packed character sprite atlas.
+
+Every character action has its own sprite sheet (sprites/<prefix>/<action>.png), a whole
+animation grid of which the game only uses the frames listed in the action's coordinates
+file (<action>.txt). `build_atlas` crops exactly those frames, for the actions in
+AVAILABLE_ACTIONS, out of the sheets of every character and packs them into a few pages
+(sprites/atlas/characters_<n>.png), all the frames of a character on the same page. An
+index (sprites/atlas/characters.json) maps every action and direction of a character to
+the rects of its frames in its page, so `AnimationAtlas` builds a character from one
+decoded page instead of a sheet and a text file per action.
+
+The index records the size and modification time of the sheets and coordinates files
+it was built from, checked once per loaded index; a character whose files changed since is
+loaded from its sheets until the atlas is rebuilt. The game and the headless runner rebuild
+it on start when it is missing or out of date (`ensure_atlas`), or it can be rebuilt by hand:
+
+    python sprite_atlas.py    # rebuild the atlas of every character
+
+Set SPRITE_ATLAS=0 to always load the sheets.
+"""
+
+import json
+import logging
+import os
+import time
+
+import pygame
+from resource_manager import ResourceManager
+
+ATLAS_DIRECTORY = os.path.join("sprites", "atlas")
+INDEX_FILE = os.path.join(ATLAS_DIRECTORY, "characters.json")
+PAGE_NAME = "characters_{}.png"
+PAGE_WIDTH = 512
+PAGE_MAX_HEIGHT = 512  # Pages are cut to the height their frames use
+VERSION = 2
+
+# Whether the sources of each packed character are unchanged, checked once per loaded index
+_checked_index = None
+_fresh = {}  # Sprite prefix -> bool
+
+
+def enabled():
+    return os.environ.get("SPRITE_ATLAS", "1") != "0"
+
+
+def _source_stat(name):
+    """[modification time in ns, size] of a file of the sprites folder"""
+    stat = os.stat(os.path.join("sprites", name))
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _actions_layout(actions):
+    return [[action.prefix, list(action.numImages)] for action in actions]
+
+
+def _packed_character(image_prefix, actions):
+    """The index entry of a character, if the atlas is enabled and up to date for it"""
+    if not enabled():
+        return None
+    index = ResourceManager.load_sprite_index(INDEX_FILE)
+    if index.get("version") != VERSION or index.get("actions") != _actions_layout(actions):
+        return None
+    character = index["characters"].get(image_prefix)
+    if character is None or not _is_fresh(index, image_prefix, character):
+        return None
+    return index["pages"][character["page"]], character
+
+
+def _is_fresh(index, image_prefix, character):
+    """Whether the files of a packed character are unchanged; stat'ed once per loaded index"""
+    global _checked_index
+    if index is not _checked_index:
+        _checked_index = index
+        _fresh.clear()
+    if image_prefix not in _fresh:
+        try:
+            _fresh[image_prefix] = all(_source_stat(name) == stat for name, stat in character["sources"].items())
+        except OSError:
+            _fresh[image_prefix] = False
+        if not _fresh[image_prefix]:
+            logging.debug(f"Packed atlas out of date for {image_prefix}, loading its sprite sheets")
+    return _fresh[image_prefix]
+
+
+def packed_frames(image_prefix, actions):
+    """
+    Frame rects of a character in its atlas page.
+
+    :param image_prefix: Sprite prefix of the character.
+    :param actions: The actions it is built with (AVAILABLE_ACTIONS).
+    :return: (page file in ATLAS_DIRECTORY, {action: {direction: [pygame.Rect, ...]}}), or
+             None when the character has to be loaded from its sheets.
+    """
+    packed = _packed_character(image_prefix, actions)
+    if packed is None:
+        return None
+    page, character = packed
+    frames = {}
+    for action, directions in character["frames"].items():
+        frames[action] = {direction: [pygame.Rect(values[i:i + 4]) for i in range(0, len(values), 4)]
+                          for direction, values in enumerate(directions)}
+    return page, frames
+
+
+def packed_assets(asset, actions):
+    """
+    What loads the same frames as `asset` from the atlas: the index and the page if it
+    is the sheet or coordinates file of a packed, up-to-date character, else `asset`.
+    """
+    kind, name, *_ = asset
+    if kind not in ("image", "coordinates") or (kind == "image" and asset[2:] not in ((), ("sprites",))):
+        return [asset]
+    packed = _packed_character(os.path.dirname(name), actions)
+    if packed is None or name not in packed[1]["sources"]:
+        return [asset]
+    return [("sprite_index", INDEX_FILE), ("image", packed[0], ATLAS_DIRECTORY)]
+
+
+def up_to_date():
+    """Whether the atlas packs every character and none of their files changed since"""
+    from characters import AVAILABLE_ACTIONS
+    index = ResourceManager.load_sprite_index(INDEX_FILE)
+    if (index.get("version") != VERSION or index.get("actions") != _actions_layout(AVAILABLE_ACTIONS)
+            or index.get("prefixes") != character_prefixes()):
+        return False
+    return all(_packed_character(prefix, AVAILABLE_ACTIONS) is not None for prefix in index["characters"])
+
+
+def ensure_atlas():
+    """
+    Builds the atlas if it is missing or out of date, the way the level caches are compiled
+    on first use. Needs a display mode set. If it cannot be built, the characters keep
+    loading from their sheets.
+    """
+    if not enabled() or up_to_date():
+        return
+    start = time.perf_counter()
+    try:
+        index = build_atlas()
+    except (ValueError, OSError, pygame.error) as err:
+        logging.warning(f"Cannot build the sprite atlas, loading the sprite sheets instead: {err}")
+        return
+    logging.info(f"Built the sprite atlas: {len(index['characters'])} characters in {len(index['pages'])} pages "
+                 f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+
+# -------------------------------------------------
+# Offline build
+
+def character_prefixes():
+    """Sprite prefixes of the player and of every enemy type"""
+    from characters import Player
+    from fase import EnemyFactory
+    prefixes = [Player.IMAGE_PREFIX]
+    for enemy_class in EnemyFactory.ENEMY_MAP.values():
+        prefix = getattr(enemy_class, "IMAGE_PREFIX", None)
+        if prefix is not None and prefix not in prefixes:
+            prefixes.append(prefix)
+    return prefixes
+
+
+class _ShelfPacker:
+    """Places rects left to right on shelves as high as their tallest rect"""
+
+    def __init__(self, width, max_height):
+        self.width = width
+        self.max_height = max_height
+        self.shelves = []  # [y, height, used width]
+        self.height = 0
+
+    def copy(self):
+        packer = _ShelfPacker(self.width, self.max_height)
+        packer.shelves = [list(shelf) for shelf in self.shelves]
+        packer.height = self.height
+        return packer
+
+    def place(self, width, height):
+        """Top-left corner for a rect of the given size, or None if it does not fit"""
+        for shelf in self.shelves:
+            if height <= shelf[1] and shelf[2] + width <= self.width:
+                shelf[2] += width
+                return shelf[2] - width, shelf[0]
+        if width > self.width or self.height + height > self.max_height:
+            return None
+        self.shelves.append([self.height, height, width])
+        self.height += height
+        return 0, self.height - height
+
+    def place_all(self, sizes):
+        """Positions for all the sizes, or None (leaving the packer untouched) if they do not fit"""
+        packer = self.copy()
+        positions = {}
+        # Tallest first, so the shelves fill up evenly
+        for key, (width, height) in sorted(sizes.items(), key=lambda item: -item[1][1]):
+            position = packer.place(width, height)
+            if position is None:
+                return None
+            positions[key] = position
+        self.shelves, self.height = packer.shelves, packer.height
+        return positions
+
+
+def _character_frames(image_prefix, actions):
+    """
+    Reads the sheets and coordinates files of a character.
+
+    :return: ({action: (sheet surface, {direction: [rects]})}, sources) or None if a file is missing.
+    """
+    from characters import AnimationAtlas
+    frames = {}
+    sources = {}
+    for action, (sheet_name, coordinates_name) in zip(actions, AnimationAtlas.sheet_files(image_prefix)):
+        try:
+            sheet = pygame.image.load(os.path.join("sprites", sheet_name)).convert_alpha()
+            with open(os.path.join("sprites", coordinates_name)) as f:
+                coordinates_text = f.read()
+            sources[sheet_name] = _source_stat(sheet_name)
+            sources[coordinates_name] = _source_stat(coordinates_name)
+        except (OSError, pygame.error) as err:
+            logging.warning(f"Not packing {image_prefix}: {err}")
+            return None
+        frames[action.prefix] = (sheet, AnimationAtlas.parse_coordinates(action, coordinates_text))
+    return frames, sources
+
+
+def build_atlas(prefixes=None):
+    """
+    Packs the frames of the given characters (by default every character) and writes the
+    pages and the index to ATLAS_DIRECTORY.
+
+    :return: The index.
+    :raises ValueError: If the frames of a character do not fit in one page.
+    """
+    from characters import AVAILABLE_ACTIONS
+    prefixes = list(prefixes or character_prefixes())
+    packers = []
+    page_frames = []  # Per page: list of (sheet, source rect, position)
+    characters = {}
+    for image_prefix in prefixes:
+        loaded = _character_frames(image_prefix, AVAILABLE_ACTIONS)
+        if loaded is None:
+            continue
+        frames, sources = loaded
+
+        # Frames are packed once, however many directions use them. Frames not inside their
+        # sheet stay out of the packing
+        sizes = {}
+        for action, (sheet, directions) in frames.items():
+            for rects in directions.values():
+                for rect in rects:
+                    if sheet.get_rect().contains(rect):
+                        sizes[(action, tuple(rect))] = rect.size
+        for page, packer in enumerate(packers):
+            positions = packer.place_all(sizes)
+            if positions is not None:
+                break
+        else:
+            packer = _ShelfPacker(PAGE_WIDTH, PAGE_MAX_HEIGHT)
+            positions = packer.place_all(sizes)
+            if positions is None:
+                raise ValueError(f"The frames of {image_prefix} do not fit in one "
+                                 f"{PAGE_WIDTH}x{PAGE_MAX_HEIGHT} atlas page")
+            packers.append(packer)
+            page_frames.append([])
+            page = len(packers) - 1
+
+        packed = {}
+        for action, (sheet, directions) in frames.items():
+            packed[action] = []
+            for direction in sorted(directions):
+                values = []
+                for rect in directions[direction]:
+                    # A frame outside its sheet is placed outside the page, so it is still
+                    # rendered as missing
+                    x, y = positions.get((action, tuple(rect)), (PAGE_WIDTH, 0))
+                    values.extend((x, y, rect.width, rect.height))
+                packed[action].append(values)
+        for (action, rect), position in positions.items():
+            page_frames[page].append((frames[action][0], pygame.Rect(rect), position))
+        characters[image_prefix] = {"page": page, "sources": sources, "frames": packed}
+
+    os.makedirs(ATLAS_DIRECTORY, exist_ok=True)
+    pages = []
+    for number, (packer, frames) in enumerate(zip(packers, page_frames)):
+        surface = pygame.Surface((PAGE_WIDTH, max(1, packer.height)), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 0))
+        for sheet, rect, position in frames:
+            # Copies the pixels as they are, alpha included, instead of blending them
+            surface.blit(sheet, position, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        name = PAGE_NAME.format(number)
+        pygame.image.save(surface, os.path.join(ATLAS_DIRECTORY, name))
+        pages.append(name)
+
+    index = {"version": VERSION, "actions": _actions_layout(AVAILABLE_ACTIONS), "prefixes": prefixes,
+             "pages": pages, "characters": characters}
+    temp_path = INDEX_FILE + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(temp_path, INDEX_FILE)
+    return ResourceManager.add_sprite_index(INDEX_FILE, index)
+
+
+def main():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1))  # For convert_alpha
+    start = time.perf_counter()
+    index = build_atlas()
+    elapsed = (time.perf_counter() - start) * 1000
+    for name in index["pages"]:
+        path = os.path.join(ATLAS_DIRECTORY, name)
+        width, height = pygame.image.load(path).get_size()
+        print(f"{path}: {width}x{height}, {os.path.getsize(path)} bytes")
+    print(f"{INDEX_FILE}: {len(index['characters'])} characters, {os.path.getsize(INDEX_FILE)} bytes ({elapsed:.0f} ms)")
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
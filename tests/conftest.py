@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The game loads its assets relative to the repository root and needs no screen or sound card here
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+LEVEL_FILES = ("levels/pasilloFIC.ldtk", "levels/kafetaFIK.ldtk")
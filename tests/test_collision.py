@@ -0,0 +1,61 @@
+import numpy as np
+import pygame
+import pytest
+
+from conftest import LEVEL_FILES
+from collision_grid import CollisionGrid
+from level import merge_solid_cells
+from level_cache import parse_ldtk
+
+
+@pytest.fixture(scope="module", params=LEVEL_FILES)
+def level(request):
+    return parse_ldtk(request.param)
+
+
+def solid_grid(level):
+    return np.frombuffer(level.solid_cells, dtype=np.uint8).reshape(level.rows, level.columns) != 0
+
+
+def tile_rects(level):
+    """One rect per solid cell, as the level collisions were before they were merged"""
+    size = level.grid_size
+    rows, columns = np.nonzero(solid_grid(level))
+    return [pygame.Rect(column * size, row * size, size, size) for row, column in zip(rows.tolist(), columns.tolist())]
+
+
+def extents(rects):
+    """What `Character._handle_collision` reads from a collision list, for every direction"""
+    if not rects:
+        return None
+    return (min(r.left for r in rects), max(r.right for r in rects),
+            min(r.top for r in rects), max(r.bottom for r in rects))
+
+
+def test_merged_rects_cover_exactly_the_solid_cells(level):
+    size = level.grid_size
+    rects = merge_solid_cells(level.solid_cells, level.columns, level.rows, size)
+    covered = np.zeros((level.rows, level.columns), dtype=np.int32)
+    for rect in rects:
+        assert rect.x % size == rect.y % size == rect.width % size == rect.height % size == 0
+        covered[rect.top // size:rect.bottom // size, rect.left // size:rect.right // size] += 1
+    # Every solid cell is covered once (no overlap) and no free cell is covered
+    assert np.array_equal(covered, solid_grid(level).astype(np.int32))
+    assert len(rects) < np.count_nonzero(covered)
+
+
+def test_query_matches_per_tile_collisions(level):
+    tiles = tile_rects(level)
+    grid = CollisionGrid(merge_solid_cells(level.solid_cells, level.columns, level.rows, level.grid_size),
+                         level.grid_size)
+    rng = np.random.default_rng(0)
+    for x, y, width, height in zip(rng.integers(-16, level.width, 5000).tolist(),
+                                   rng.integers(-16, level.height, 5000).tolist(),
+                                   rng.integers(1, 64, 5000).tolist(),
+                                   rng.integers(1, 64, 5000).tolist()):
+        probe = pygame.Rect(x, y, width, height)
+        # Tiles the per-tile `pygame.sprite.spritecollide` used to return
+        expected = [tiles[index] for index in probe.collidelistall(tiles)]
+        found = grid.query(probe)
+        assert extents(found) == extents(expected), probe
+        assert grid.collides(probe) == bool(expected), probe
@@ -0,0 +1,15 @@
+import pytest
+
+import headless
+
+STATE_FIELDS = ("ticks", "outcome", "health", "coins", "enemies")
+
+
+def final_state(level_name, seed):
+    result = headless.run_level(level_name, 10, headless.RandomInput(seed))
+    return {field: result[field] for field in STATE_FIELDS}
+
+
+@pytest.mark.parametrize("level_name", headless.playable_levels())
+def test_same_seed_replays_the_same_game(level_name):
+    assert final_state(level_name, seed=3) == final_state(level_name, seed=3)
@@ -0,0 +1,75 @@
+import os
+import shutil
+import struct
+
+import numpy as np
+import pytest
+
+from conftest import LEVEL_FILES
+from level_cache import HEADER, SOURCE_STAT_OFFSET, cache_path, parse_ldtk, read_cache, write_cache
+
+
+@pytest.fixture(params=LEVEL_FILES)
+def level_file(request, tmp_path):
+    """A copy of a shipped level with its compiled cache written next to it"""
+    path = str(tmp_path / os.path.basename(request.param))
+    shutil.copyfile(request.param, path)
+    write_cache(parse_ldtk(path), path)
+    return path
+
+
+def assert_same_level(loaded, parsed):
+    for field in ("width", "height", "grid_size", "columns", "rows"):
+        assert getattr(loaded, field) == getattr(parsed, field)
+    for field in ("floor_tiles", "decoration_tiles", "solid_cells"):
+        assert np.array_equal(getattr(loaded, field), getattr(parsed, field))
+
+
+def cached_mtime(level_file):
+    with open(cache_path(level_file), "rb") as f:
+        f.seek(SOURCE_STAT_OFFSET)
+        return struct.unpack("<q", f.read(8))[0]
+
+
+def test_round_trip(level_file):
+    loaded = read_cache(level_file)
+    assert loaded is not None
+    assert_same_level(loaded, parse_ldtk(level_file))
+    # Views of the mapped file, not copies
+    for field in ("floor_tiles", "decoration_tiles", "solid_cells"):
+        assert not getattr(loaded, field).flags.owndata
+
+
+def test_new_mtime_with_the_same_content_is_still_valid(level_file):
+    stat = os.stat(level_file)
+    os.utime(level_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    loaded = read_cache(level_file)
+    assert loaded is not None
+    assert_same_level(loaded, parse_ldtk(level_file))
+    # The new modification time is recorded, so the project is not hashed again
+    assert cached_mtime(level_file) == os.stat(level_file).st_mtime_ns
+
+
+def test_size_change_invalidates(level_file):
+    with open(level_file, "ab") as f:
+        f.write(b" ")
+    assert read_cache(level_file) is None
+
+
+def test_content_change_with_the_same_size_invalidates(level_file):
+    stat = os.stat(level_file)
+    with open(level_file, "r+b") as f:
+        first = f.read(1)
+        f.seek(0)
+        f.write(b"[" if first != b"[" else b"{")
+    os.utime(level_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert os.stat(level_file).st_size == stat.st_size
+    assert read_cache(level_file) is None
+
+
+@pytest.mark.parametrize("length", [0, HEADER.size - 1, HEADER.size, -1])
+def test_truncated_cache_invalidates(level_file, length):
+    path = cache_path(level_file)
+    with open(path, "r+b") as f:
+        f.truncate(length if length >= 0 else os.path.getsize(path) + length)
+    assert read_cache(level_file) is None